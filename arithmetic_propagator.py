@@ -0,0 +1,194 @@
+#!/usr/bin/env python
+#
+# Author:   Armando Diaz Tolentino <ajdt@cs.washington.edu>
+#
+# Desc:     Coefficient arithmetic for the encoding, done during search instead
+#           of during grounding. With arithmeticPropagator = 1 (config_params.lp)
+#           polynomial.lp no longer joins every pair of coefficient values:
+#               1. mono siblings with the same degree are ordered by coefficient
+#               2. _hasCommonCoeff(Time, Poly, Coeff) is a choice, Coeff must divide
+#                  the coefficient of every term of Poly
+#               3. _isFactorable(Time, Poly) is a choice, x^2 + b*x + c must have
+#                  integer factors
+#           ArithmeticPropagator checks these on every total assignment and adds
+#           a clause ruling the assignment out when one is violated.
+#           ArithmeticContext provides the @-functions used while grounding
+#           (the factor pairs of _factors/4). Use registerWith() on a clingo.Control
+#           before grounding, or clingo_backend.InProcessSolver(..., arithmetic=True).
+#
+from collections import defaultdict
+import clingo
+
+CONST_NAME = 'arithmeticPropagator'
+
+# @return True if coeff * Snd == prod for some Snd, with Snd and coeff + Snd within
+#       +/- max_coeff (same pairs as _coeffFactorOf in polynomial.lp)
+def isCoeffFactorOf(coeff, prod, max_coeff):
+    if coeff == 0:
+        return prod == 0
+    if prod % coeff != 0:
+        return False
+    snd = prod // coeff
+    return abs(snd) <= max_coeff and abs(coeff + snd) <= max_coeff
+
+# @return True if Fst + Snd == coeff_sum and Fst * Snd == coeff_prod for coefficients
+#       Fst, Snd (same values as _factorable in polynomial.lp)
+def isFactorable(coeff_sum, coeff_prod, max_coeff):
+    if abs(coeff_sum) > max_coeff or abs(coeff_prod) > max_coeff:
+        return False
+    discriminant = coeff_sum * coeff_sum - 4 * coeff_prod
+    if discriminant < 0:
+        return False
+    root = int(discriminant ** 0.5)
+    while root * root > discriminant:
+        root -= 1
+    while (root + 1) * (root + 1) <= discriminant:
+        root += 1
+    if root * root != discriminant or (coeff_sum + root) % 2 != 0:
+        return False
+    return abs(coeff_sum + root) // 2 <= max_coeff and abs(coeff_sum - root) // 2 <= max_coeff
+
+# @return list of (Fst, Snd, Sum, Prod) tuples with Fst <= Snd and all four within +/- max_coeff
+def getFactorPairs(max_coeff):
+    pairs = []
+    for fst in range(-max_coeff, max_coeff + 1):
+        # |Fst * Snd| <= max_coeff bounds Snd, so this isn't quadratic in max_coeff
+        bound = max_coeff if fst == 0 else max_coeff // abs(fst)
+        for snd in range(max(fst, -bound), bound + 1):
+            if abs(fst + snd) <= max_coeff:
+                pairs.append((fst, snd, fst + snd, fst * snd))
+    return pairs
+
+class ArithmeticContext(object):
+    """@-functions for clingo.Control.ground()"""
+    def factorPairs(self, max_coeff):
+        return [clingo.Function('', [clingo.Number(value) for value in pair]) for pair in getFactorPairs(max_coeff.number)]
+
+def getSymbolLiterals(init, name, arity):
+    """ return list of (symbol, solver_literal) pairs for the atoms name/arity"""
+    return [(atom.symbol, init.solver_literal(atom.literal)) for atom in init.symbolic_atoms.by_signature(name, arity)]
+
+# the true literal of a dictionary solver_literal --> value, or None
+def findTrueLiteral(assignment, literal_values):
+    for literal in literal_values:
+        if assignment.is_true(literal):
+            return literal
+    return None
+
+class MonoOrderCheck(object):
+    """mono siblings Fst < Snd with the same degree need SndCoeff >= FstCoeff"""
+    def __init__(self, siblings_literal, fst_degrees, snd_degrees, fst_coeffs, snd_coeffs):
+        super(MonoOrderCheck, self).__init__()
+        self.siblings_literal = siblings_literal
+        self.fst_degrees, self.snd_degrees = fst_degrees, snd_degrees
+        self.fst_coeffs, self.snd_coeffs = fst_coeffs, snd_coeffs
+
+    # @return a clause if the assignment violates the check, None otherwise
+    def getViolatedClause(self, assignment):
+        if not assignment.is_true(self.siblings_literal):
+            return None
+        fst_deg, snd_deg = findTrueLiteral(assignment, self.fst_degrees), findTrueLiteral(assignment, self.snd_degrees)
+        if fst_deg is None or snd_deg is None or self.fst_degrees[fst_deg] != self.snd_degrees[snd_deg]:
+            return None
+        fst_coeff, snd_coeff = findTrueLiteral(assignment, self.fst_coeffs), findTrueLiteral(assignment, self.snd_coeffs)
+        if fst_coeff is None or snd_coeff is None or self.snd_coeffs[snd_coeff] >= self.fst_coeffs[fst_coeff]:
+            return None
+        return [-self.siblings_literal, -fst_deg, -snd_deg, -fst_coeff, -snd_coeff]
+
+class CommonCoeffCheck(object):
+    """_hasCommonCoeff(Time, Poly, Coeff) iff Coeff is a factor of every coefficient of Poly"""
+    def __init__(self, common_literal, poly_literal, coeff, term_coeffs, max_coeff):
+        super(CommonCoeffCheck, self).__init__()
+        self.common_literal, self.poly_literal = common_literal, poly_literal
+        # literals of _polyHasTermWithCoeff(Time, Poly, MonoCoeff) that aren't multiples of coeff
+        self.non_multiples = [literal for literal, mono_coeff in term_coeffs.items()
+                if not isCoeffFactorOf(coeff, mono_coeff, max_coeff)]
+
+    def getViolatedClause(self, assignment):
+        non_multiple = findTrueLiteral(assignment, self.non_multiples)
+        if assignment.is_true(self.common_literal):
+            return None if non_multiple is None else [-self.common_literal, -non_multiple]
+        if non_multiple is None and assignment.is_true(self.poly_literal):
+            return [self.common_literal, -self.poly_literal] + self.non_multiples
+        return None
+
+class FactorableCheck(object):
+    """_isFactorable(Time, Poly) iff the linear and constant coefficients of Poly are _factorable"""
+    def __init__(self, factorable_literal, candidate_literal, linear_coeffs, const_coeffs, max_coeff):
+        super(FactorableCheck, self).__init__()
+        self.factorable_literal, self.candidate_literal = factorable_literal, candidate_literal
+        self.linear_coeffs, self.const_coeffs = linear_coeffs, const_coeffs
+        self.max_coeff = max_coeff
+
+    def getViolatedClause(self, assignment):
+        linear = findTrueLiteral(assignment, self.linear_coeffs)
+        const = findTrueLiteral(assignment, self.const_coeffs)
+        factorable = (linear is not None and const is not None and assignment.is_true(self.candidate_literal)
+                and isFactorable(self.linear_coeffs[linear], self.const_coeffs[const], self.max_coeff))
+        if factorable and not assignment.is_true(self.factorable_literal):
+            return [self.factorable_literal, -self.candidate_literal, -linear, -const]
+        if not factorable and assignment.is_true(self.factorable_literal):
+            # rule out this assignment of the poly's linear and constant terms
+            literals = list(self.linear_coeffs.keys()) + list(self.const_coeffs.keys())
+            return [-self.factorable_literal] + [-lit if assignment.is_true(lit) else lit for lit in literals]
+        return None
+
+class ArithmeticPropagator(object):
+    """checks the coefficient arithmetic left out of the ground program, see the module description"""
+    def __init__(self):
+        super(ArithmeticPropagator, self).__init__()
+        self.checks = []
+
+    def init(self, init):
+        max_coeff = max([symbol.arguments[0].number for symbol, literal in getSymbolLiterals(init, '_coeff', 1)] or [0])
+        # (Time, Node) --> {solver_literal: value}
+        coeffs, degrees = defaultdict(dict), defaultdict(dict)
+        for symbol, literal in getSymbolLiterals(init, '_isTheCoefficientOf', 3):
+            time, node, coeff = symbol.arguments
+            coeffs[(time, node)][literal] = coeff.number
+        for symbol, literal in getSymbolLiterals(init, '_isTheDegreeOf', 3):
+            time, node, degree = symbol.arguments
+            degrees[(time, node)][literal] = degree.number
+        for symbol, literal in getSymbolLiterals(init, '_monoSiblings', 3):
+            time, fst, snd = symbol.arguments
+            self.checks.append(MonoOrderCheck(literal, degrees[(time, fst)], degrees[(time, snd)],
+                    coeffs[(time, fst)], coeffs[(time, snd)]))
+
+        # (Time, Poly) --> {solver_literal: value}
+        term_coeffs = defaultdict(dict)
+        for symbol, literal in getSymbolLiterals(init, '_polyHasTermWithCoeff', 3):
+            time, poly, coeff = symbol.arguments
+            term_coeffs[(time, poly)][literal] = coeff.number
+        polys = dict([(tuple(symbol.arguments), literal) for symbol, literal in getSymbolLiterals(init, '_isPolynomial', 2)])
+        for symbol, literal in getSymbolLiterals(init, '_hasCommonCoeff', 3):
+            time, poly, coeff = symbol.arguments
+            self.checks.append(CommonCoeffCheck(literal, polys[(time, poly)], coeff.number,
+                    term_coeffs[(time, poly)], max_coeff))
+
+        # (Time, Poly, Degree) --> {solver_literal: coeff}
+        poly_terms = defaultdict(dict)
+        for symbol, literal in getSymbolLiterals(init, '_monoTermOfPoly', 4):
+            time, poly, degree, coeff = symbol.arguments
+            poly_terms[(time, poly, degree.number)][literal] = coeff.number
+        candidates = dict([(tuple(symbol.arguments), literal) for symbol, literal in getSymbolLiterals(init, '_mayBeFactorable', 2)])
+        for symbol, literal in getSymbolLiterals(init, '_isFactorable', 2):
+            time, poly = symbol.arguments
+            self.checks.append(FactorableCheck(literal, candidates[(time, poly)],
+                    poly_terms[(time, poly, 1)], poly_terms[(time, poly, 0)], max_coeff))
+
+    def check(self, control):
+        for arith_check in self.checks:
+            clause = arith_check.getViolatedClause(control.assignment)
+            if clause is not None:
+                if not control.add_clause(clause) or not control.propagate():
+                    return
+
+# register the propagator with control, which must have been created with getControlArgs()
+# @return the context to pass on to control.ground()
+def registerWith(control):
+    control.register_propagator(ArithmeticPropagator())
+    return ArithmeticContext()
+
+# @return control options that enable the propagator's encoding (see config_params.lp)
+def getControlArgs():
+    return ['-c', CONST_NAME + '=1']
@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+#
+# Author:   Armando Diaz Tolentino <ajdt@cs.washington.edu>
+#
+# Desc:     Reads our .lp files at the level of statements (rules, facts,
+#           constraints and directives). Resolves #include directives and
+#           provides small helpers to look at the variables and predicates
+#           used by a statement. This is deliberately not a full gringo
+#           parser, it only understands the syntax our encoding uses.
+#
+import os
+import re
+from collections import namedtuple
+
+Statement = namedtuple('Statement', ['file_name', 'line', 'text'])
+
+INCLUDE_REGEX   = re.compile(r'^#include\s+"([^"]+)"\s*\.?$')
+VARIABLE_REGEX  = re.compile(r'(?<![A-Za-z0-9_])[A-Z][A-Za-z0-9_]*')
+PREDICATE_REGEX = re.compile(r'(?<![A-Za-z0-9_])(_{0,2}[a-z][A-Za-z0-9_]*)\s*(\()?')
+
+# @param code string containing asp code
+# @return list of (line_number, statement_text) pairs, comments are removed
+#       and each statement keeps its terminating period
+def splitStatements(code):
+    statements = []
+    current, start_line, line_num = [], None, 1
+    in_comment, in_string = False, False
+    for idx, char in enumerate(code):
+        if char == '\n':
+            line_num += 1
+            in_comment = False
+        if in_comment:
+            continue
+        if char == '%' and not in_string:
+            in_comment = True
+            continue
+        if char == '"':
+            in_string = not in_string
+        if start_line is None:
+            if char.isspace():
+                continue
+            start_line = line_num
+        current.append(char)
+        # a period ends a statement unless it's part of a range (..)
+        if char == '.' and not in_string:
+            prev_char = code[idx-1] if idx > 0 else ''
+            next_char = code[idx+1] if idx+1 < len(code) else ''
+            if prev_char != '.' and next_char != '.':
+                statements.append((start_line, ''.join(current).strip()))
+                current, start_line = [], None
+    if ''.join(current).strip():
+        statements.append((start_line, ''.join(current).strip()))
+    return statements
+
+# @return the file name referenced by an #include statement, None otherwise
+def includedFileName(statement_text):
+    match = INCLUDE_REGEX.match(statement_text.strip())
+    return match.group(1) if match else None
+
+# @param file_name .lp file to read
+# @param follow_includes if true, statements of included files replace the #include directive
+# @return list of Statement instances in the order gringo would see them
+def readStatements(file_name, follow_includes=True, _seen=None):
+    seen = set() if _seen is None else _seen
+    seen.add(os.path.abspath(file_name))
+    base_dir = os.path.dirname(file_name)
+    lp_file = open(file_name, 'r')
+    code = lp_file.read()
+    lp_file.close()
+
+    statements = []
+    for line, text in splitStatements(code):
+        included = includedFileName(text)
+        if included is not None and follow_includes:
+            included = os.path.join(base_dir, included)
+            if os.path.abspath(included) not in seen: # gringo includes a file only once
+                statements += readStatements(included, True, seen)
+        else:
+            statements.append(Statement(file_name, line, text))
+    return statements
+
+# @return pair (head, body) of strings, body is '' for facts and head is '' for constraints
+def splitRule(statement_text):
+    text = statement_text.strip()
+    if text.endswith('.'):
+        text = text[:-1]
+    if ':-' not in text:
+        return text.strip(), ''
+    head, body = text.split(':-', 1)
+    return head.strip(), body.strip()
+
+def isDirective(statement_text):
+    return statement_text.strip().startswith('#')
+
+# @return set of variable names occurring in text (the anonymous variable is ignored)
+def variablesIn(text):
+    return set(VARIABLE_REGEX.findall(text))
+
+# @return list of (name, arity) keys for each predicate or function term in text, in order
+def predicateKeysIn(text):
+    keys = []
+    for match in PREDICATE_REGEX.finditer(text):
+        name, has_args = match.group(1), match.group(2)
+        arity = countArguments(text, match.end()-1) if has_args else 0
+        keys.append((name, arity))
+    return keys
+
+# @param text string with an open paren at position open_idx
+# @return number of top-level arguments between the parens
+def countArguments(text, open_idx):
+    depth, num_args, has_content = 0, 1, False
+    for char in text[open_idx:]:
+        if char == '(':
+            depth += 1
+            if depth == 1:
+                continue
+        elif char == ')':
+            depth -= 1
+            if depth == 0:
+                break
+        elif char == ',' and depth == 1:
+            num_args += 1
+        if not char.isspace():
+            has_content = True
+    return num_args if has_content else 0
+
+# @return the outermost predicate keys of the head of a rule (empty list for constraints)
+def headPredicateKeys(statement_text):
+    head, body = splitRule(statement_text)
+    return outermostPredicateKeys(head)
+
+# @return (name, arity) keys for predicates at paren depth zero of text
+def outermostPredicateKeys(text):
+    keys = []
+    for match in PREDICATE_REGEX.finditer(text):
+        if text[:match.start()].count('(') - text[:match.start()].count(')') != 0:
+            continue
+        if text[:match.start()].count('{') - text[:match.start()].count('}') not in [0, 1]:
+            continue
+        name, has_args = match.group(1), match.group(2)
+        if name in ['not']:
+            continue
+        arity = countArguments(text, match.end()-1) if has_args else 0
+        keys.append((name, arity))
+    return keys
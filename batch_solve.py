@@ -0,0 +1,158 @@
+#!/usr/bin/env python
+#
+# Author:   Armando Diaz Tolentino <ajdt@cs.washington.edu>
+#
+# Desc:     Solves a corpus of stored problems against a single ground program.
+#           The solver encoding (all_solutions.lp by default) is ground once with
+#           initial_state_externals.lp, then for every problem the externals for
+#           its time-0 _holds facts are set to true and the program is solved.
+#           Problems are read from a directory of .prob files (as written by
+#           make_algebra_probs.py), or from a file or stdin ('-') with problems
+#           separated by empty lines. The solutions of each problem are in the
+#           json format of 'clingo --outf=2', written to --outputDir as
+#           all_soln_for_N.prob, or printed as one json object per line.
+#               python batch_solve.py probs --outputDir soln
+#
+import os
+import sys
+import json
+import time
+import argparse
+import clingo
+import clingo_backend
+import solver_stats
+
+EXTERNALS_FILE  = 'initial_state_externals.lp'
+SOLUTION_PREFIX = 'all_soln_for_' # same file names as make_algebra_probs.py
+DEFAULT_ARGS    = ['--project', '-n', '0']
+DERIVED_FIELDS  = ['numer', 'denom'] # derived in nodes.lp, not external
+
+# @param lines iterable of lines with one fact each, empty lines separate problems
+# @return generator of lists of fact strings (periods removed)
+def splitProblems(lines):
+    facts = []
+    for line in lines:
+        line = line.strip()
+        if line:
+            facts.append(line[:-1] if line.endswith('.') else line)
+        elif facts:
+            yield facts
+            facts = []
+    if facts:
+        yield facts
+
+# @return generator of (prob_name, facts) pairs, one for every .prob file in directory
+def readProblemDirectory(directory):
+    for file_name in sorted([name for name in os.listdir(directory) if name.endswith('.prob')]):
+        prob_file = open(os.path.join(directory, file_name), 'r')
+        facts = [fact for problem in splitProblems(prob_file) for fact in problem]
+        prob_file.close()
+        yield file_name, facts
+
+# @return generator of (prob_name, facts) pairs, problems are named by position (1.prob, 2.prob, ...)
+def readProblemStream(file_obj):
+    for index, facts in enumerate(splitProblems(file_obj)):
+        yield '%d.prob' % (index + 1), facts
+
+# @return the name of the node field of a _holds(Time, _fact(Node, _nodeField(Field, Value))) symbol
+def getFieldName(holds_symbol):
+    return holds_symbol.arguments[1].arguments[1].arguments[0].name
+
+# @param models list of models, each a list of atom strings
+# @return dictionary in the format of clingo's json output
+def makeClingoJSON(models, solve_result, solve_time):
+    return {'Solver'    : 'clingo version ' + clingo.__version__,
+            'Call'      : [{'Witnesses': [{'Value': model} for model in models]}],
+            'Result'    : solver_stats.RESULT_STRINGS.get(str(solve_result), 'UNKNOWN'),
+            'Models'    : {'Number': len(models), 'More': 'no'},
+            'Calls'     : 1,
+            'Time'      : {'Total': solve_time, 'Solve': solve_time}}
+
+class BatchSolver(object):
+    """grounds a solver encoding once, then solves it for one initial state at a time"""
+    def __init__(self, lp_file='all_solutions.lp', control_args=DEFAULT_ARGS):
+        super(BatchSolver, self).__init__()
+        self.solver = clingo_backend.InProcessSolver([lp_file, EXTERNALS_FILE], control_args)
+        self.solver.ground()
+        self.externals = set()
+        self.start_times = set()
+        for sym_atom in self.solver.control.symbolic_atoms.by_signature('_holds', 2):
+            if sym_atom.is_external:
+                self.externals.add(sym_atom.symbol)
+                self.start_times.add(sym_atom.symbol.arguments[0])
+        self.start_times = sorted(self.start_times)
+
+    # @param facts list of _holds fact strings for time step 0, as in a .prob file
+    # @return list of external Symbols for the facts, for every time stream
+    def getInitialAtoms(self, facts):
+        atoms = []
+        for fact in facts:
+            symbol = clingo.parse_term(fact)
+            if symbol.name != '_holds' or getFieldName(symbol) in DERIVED_FIELDS:
+                continue
+            for start_time in self.start_times:
+                atom = clingo.Function('_holds', [start_time, symbol.arguments[1]])
+                if atom not in self.externals:
+                    raise ValueError('%s is not in the ground program (different constants?)' % fact)
+                atoms.append(atom)
+        return atoms
+
+    # @param facts see getInitialAtoms()
+    # @param timeout seconds before the problem is given up (clingo_backend.SolveTimeout)
+    # @return the problem's solutions in the format of clingo's json output
+    def solve(self, facts, timeout=None):
+        atoms = self.getInitialAtoms(facts)
+        for atom in atoms:
+            self.solver.assignExternal(atom, True)
+        models = []
+        start = time.time()
+        try:
+            solve_result = self.solver.solve(lambda symbols: models.append([str(sym) for sym in symbols]), timeout=timeout)
+        finally:
+            for atom in atoms: # reset the initial state for the next problem
+                self.solver.assignExternal(atom, False)
+        return makeClingoJSON(models, solve_result, time.time() - start)
+
+def writeSolution(output_dir, prob_name, clingo_json):
+    file_name = os.path.join(output_dir, SOLUTION_PREFIX + prob_name)
+    out_file = open(file_name + '.tmp', 'w')
+    json.dump(clingo_json, out_file)
+    out_file.close()
+    os.rename(file_name + '.tmp', file_name)
+
+def getProblems(source):
+    if source == '-':
+        return readProblemStream(sys.stdin)
+    if os.path.isdir(source):
+        return readProblemDirectory(source)
+    return readProblemStream(open(source, 'r'))
+
+def main(args):
+    batch_solver = BatchSolver(args.lp_file, DEFAULT_ARGS + args.clingo.split())
+    sys.stderr.write('ground %s once in %.2fs\n' % (args.lp_file, batch_solver.solver.ground_time))
+    num_solved, start = 0, time.time()
+    for prob_name, facts in getProblems(args.problems):
+        try:
+            clingo_json = batch_solver.solve(facts, args.timeout)
+        except (ValueError, clingo_backend.SolveTimeout) as err: # report the problem, but keep going
+            sys.stderr.write('failed on %s: %s\n' % (prob_name, err))
+            continue
+        if args.outputDir:
+            writeSolution(args.outputDir, prob_name, clingo_json)
+        else:
+            sys.stdout.write(json.dumps({'problem': prob_name, 'solution': clingo_json}) + '\n')
+            sys.stdout.flush()
+        num_solved += 1
+    sys.stderr.write('solved %d problems in %.2fs\n' % (num_solved, time.time() - start))
+
+def getCmdLineArgs():
+    cmd_parser = argparse.ArgumentParser(description='solve stored problems against one ground program')
+    cmd_parser.add_argument('problems') # directory of .prob files, a file of problems, or - for stdin
+    cmd_parser.add_argument('--lp_file', default='all_solutions.lp', required=False)
+    cmd_parser.add_argument('--clingo', default='', required=False) # additional clingo options, e.g. '-c maxSteps=2'
+    cmd_parser.add_argument('--outputDir', default=None, required=False) # json lines on stdout if not given
+    cmd_parser.add_argument('--timeout', type=float, default=None, required=False) # seconds per problem
+    return cmd_parser.parse_args()
+
+if __name__ == "__main__":
+    main(getCmdLineArgs())
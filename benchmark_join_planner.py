@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+#
+# Author:   Armando Diaz Tolentino <ajdt@cs.washington.edu>
+#
+# Desc:     Compares the body order search of explanation_extractor with the
+#           join_planner version, on the step views of recorded multi-step traces
+#           (clingo --outf=2, all_solutions.lp or eqn_generator.lp):
+#               ExplanationTemplate.unify() vs unifyVars(), for every template
+#               with Time and with head groundings assigned
+#           Both must give the same first unifier.
+#               clingo all_solutions.lp prob.lp -c maxSteps=2 -n 0 --outf=2 > trace.json
+#               python benchmark_join_planner.py trace.json
+#
+import sys
+import time
+import argparse
+import witness_reader
+import explanation_extractor as explain
+from model_manager import TimePartitionedModel
+
+# @return list of (view, time string) for every step of every witness in the file
+def readStepViews(file_name, max_witnesses):
+    clingo_file = open(file_name, 'r')
+    step_views = []
+    for index, witness in enumerate(witness_reader.WitnessReader(clingo_file).witnesses()):
+        if index == max_witnesses:
+            break
+        model = TimePartitionedModel()
+        for predicate_string in witness_reader.stripUnderscores(witness['Value']):
+            model.addPredicate(predicate_string)
+        for step in sorted(set([time_obj.step for time_obj in model.partitions.keys()])):
+            step_views.append((model.getStepView(step), 'time(%d,1)' % step))
+    clingo_file.close()
+    return step_views
+
+# @return list of (template, assignment) pairs: Time only, and the head variables of a few head groundings
+def getUnifyQueries(template_mgr, view, time_string, groundings_per_head=3):
+    queries = []
+    for template in template_mgr.templates.values():
+        head_vars = explain.ExplanationTemplate.getPredicateVariables(template.rule.head)
+        queries.append((template, {'Time': time_string}))
+        if head_vars == None or not all([isinstance(var, str) for var in head_vars]):
+            continue
+        head_key = explain.ExplanationManager.makePredKey(template.rule.head)
+        head_key = (head_key[0].replace('_', ''), head_key[1])
+        for grounding in view.getAllGroundInstancesOf(head_key)[:groundings_per_head]:
+            queries.append((template, dict(zip(head_vars, grounding))))
+    return queries
+
+def bodyOrderUnify(template, assign, view):
+    return explain.ExplanationTemplate.unify(dict(assign), explain.filterUnusedConditions(template.rule.body), view)
+
+def plannedUnify(template, assign, view):
+    return template.unifyVars(dict(assign), view)
+
+# @return result of the query, or the class of the exception it raised
+# NOTE: some body order searches fail on conditions they can't handle, like comparisons
+def runQuery(query_fnc, query):
+    try:
+        return query_fnc(*query)
+    except Exception as err:
+        return err.__class__
+
+# @return (seconds, list of results) for running every query repeat times
+def timeQueries(query_fnc, queries, repeat):
+    start = time.time()
+    for rep in range(repeat):
+        results = [runQuery(query_fnc, query) for query in queries]
+    return time.time() - start, results
+
+def main(args):
+    template_mgr = explain.getTemplateManager()
+    step_views = readStepViews(args.clingo_output, args.max_witnesses)
+    queries = []
+    for view, time_string in step_views:
+        queries += [(template, assign, view) for template, assign in getUnifyQueries(template_mgr, view, time_string)]
+    print('%d steps, %d unify queries, %d repetitions' % (len(step_views), len(queries), args.repeat))
+    body_order_time, expected = timeQueries(bodyOrderUnify, queries, args.repeat)
+    planned_time, results = timeQueries(plannedUnify, queries, args.repeat)
+    num_mismatches = len([exp for exp, res in zip(expected, results) if exp != res])
+    print('body order %8.3fs  planned %8.3fs  speedup %.1fx, %d mismatches'
+            % (body_order_time, planned_time, body_order_time / max(planned_time, 1e-9), num_mismatches))
+    return 1 if num_mismatches else 0
+
+def getCmdLineArgs():
+    cmd_parser = argparse.ArgumentParser(description='benchmark the join planner of explanation_extractor')
+    cmd_parser.add_argument('clingo_output') # clingo json output
+    cmd_parser.add_argument('--repeat', type=int, default=1, required=False)
+    cmd_parser.add_argument('--max_witnesses', type=int, default=-1, required=False) # -1 for every witness
+    return cmd_parser.parse_args()
+
+if __name__ == "__main__":
+    sys.exit(main(getCmdLineArgs()))
@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+#
+# Author:   Armando Diaz Tolentino <ajdt@cs.washington.edu>
+#
+# Desc:     Measures requests per second for heuristic sequence requests.
+#           'regrounding' adds the request as integrity constraints and grounds
+#           eqn_generator.lp for every request (what DemoRunner does, minus the
+#           cost of starting clingo), 'assumptions' grounds once and answers each
+#           request with DemoQuerySolver.
+#
+import argparse
+import random
+import time
+import asp_source
+import clingo_backend
+from demo_runner import DemoQuerySolver, getHeuristicSequenceAtoms
+
+# @return list of heuristic names declared in rules_file
+def getHeuristicNames(rules_file='rules.lp'):
+    names = []
+    for stmt in asp_source.readStatements(rules_file):
+        if stmt.text.startswith('_theCategoryOfHeuristicIs('):
+            names.append(stmt.text[len('_theCategoryOfHeuristicIs('):].split(',')[0].strip())
+    return names
+
+def makeRequests(num_requests, seq_length, seed):
+    rand = random.Random(seed)
+    heuristics = getHeuristicNames()
+    return [' '.join([rand.choice(heuristics) for step in range(seq_length)]) for req in range(num_requests)]
+
+def countModels(symbols, counter):
+    counter[0] += 1
+
+def runRegrounding(requests, control_args):
+    num_models = [0]
+    for heur_seq in requests:
+        solver = clingo_backend.InProcessSolver(['eqn_generator.lp'], control_args)
+        solver.add(''.join([':- not ' + atom + '.\n' for atom in getHeuristicSequenceAtoms(heur_seq)]))
+        solver.ground()
+        solver.solve(lambda symbols: countModels(symbols, num_models))
+    return num_models[0]
+
+def runAssumptions(requests, control_args):
+    num_models = [0]
+    query_solver = DemoQuerySolver('eqn_generator.lp', control_args)
+    for heur_seq in requests:
+        assumptions = query_solver.getAssumptions(heur_seq)
+        query_solver.solver.solve(lambda symbols: countModels(symbols, num_models), assumptions)
+    return num_models[0]
+
+def main(args):
+    requests = makeRequests(int(args.numRequests), int(args.seqLength), int(args.seed))
+    control_args = ['-n', '1'] + args.clingo.split()
+    for name, run_mode in [('regrounding', runRegrounding), ('assumptions', runAssumptions)]:
+        start = time.time()
+        num_models = run_mode(requests, control_args)
+        elapsed = time.time() - start
+        print('%-12s %d requests %d models %.2fs %.3f requests/sec' % (name, len(requests), num_models, elapsed, len(requests)/elapsed))
+
+def getCmdLineArgs():
+    cmd_parser = argparse.ArgumentParser(description='requests/sec of ground-once heuristic sequence requests')
+    cmd_parser.add_argument('--numRequests', default='20', required=False)
+    cmd_parser.add_argument('--seqLength', default='1', required=False)
+    cmd_parser.add_argument('--seed', default='0', required=False)
+    cmd_parser.add_argument('--clingo', default='', required=False) # additional options for clingo
+    return cmd_parser.parse_args()
+
+if __name__ == "__main__":
+    main(getCmdLineArgs())
@@ -0,0 +1,166 @@
+#!/usr/bin/env python
+#
+# Author:   Armando Diaz Tolentino <ajdt@cs.washington.edu>
+#
+# Desc:     Benchmark suite for the encoding. Runs clingo over the cross product
+#           of a grid of config_params.lp constants and heuristic targets (the first
+#           step must use the heuristic, like the RULENAMES loop in viz_tst.sh), with
+#           fixed seeds. Every run records ground time, solve time, models/sec,
+#           peak memory and the result (SAT/UNSAT/UNKNOWN) in a json results file.
+#           Runs where clingo fails (syntax error, bad -c, crash, killed...) are recorded
+#           with result ERROR and clingo's exit code, and aren't compared to the baseline.
+#           With --baseline, results are compared against an earlier results file
+#           and regressions are reported (exit status 1). No baseline is kept in the
+#           repo, timings are only comparable on the same machine, so record one first:
+#               python benchmark_suite.py --output baseline.json
+#               python benchmark_suite.py --output new.json --baseline baseline.json
+#
+import os
+import sys
+import json
+import time
+import argparse
+import itertools
+import subprocess
+
+# constants of config_params.lp and the values tried for each
+DEFAULT_GRID = {
+    'maxDepth'          : [2, 3],
+    'maxChildren'       : [3, 4],
+    'maxInitialCoeff'   : [5],
+    'maxInitialDeg'     : [2],
+    'maxSteps'          : [1, 2],
+    'maxNumStreams'     : [1],
+    }
+DEFAULT_SEEDS       = [1, 2, 3]
+TIME_METRICS        = ['ground_time', 'solve_time']
+# clingo's exit code for a finished run: 10 (SAT), 20 (UNSAT) or 30 (SAT, search space
+# exhausted), the +1/+2 variants flag an interrupted search (e.g. --time-limit).
+# Any other code means clingo failed, and its output can't be trusted
+SUCCESS_EXIT_CODES  = [code + flags for code in [10, 20, 30] for flags in [0, 1, 2]]
+
+# @param grid dictionary constant name --> list of values
+# @return list of dictionaries, one for each combination of values
+def expandGrid(grid):
+    names = sorted(grid.keys())
+    return [dict(zip(names, values)) for values in itertools.product(*[grid[name] for name in names])]
+
+# @return a string identifying a run, used to match runs against the baseline
+def getRunKey(config, heuristic, seed):
+    const_string = ','.join(['%s=%s' % (name, config[name]) for name in sorted(config.keys())])
+    return '%s|%s|%s' % (const_string, heuristic or '-', seed)
+
+# run clingo once, returns a dictionary with the measurements for the run
+def runClingo(lp_file, config, heuristic, seed, num_models, time_limit):
+    cmd = ['clingo', lp_file, '--outf=2', '--stats', '-n', str(num_models), '--seed=' + str(seed),
+            '--sign-def=rnd', '--time-limit=' + str(time_limit)]
+    for name, value in sorted(config.items()):
+        cmd += ['-c', '%s=%s' % (name, value)]
+    constraint = ''
+    if heuristic:
+        constraint = ':- not _selectedHeuristic(_time(0,1), %s).\n' % heuristic
+        cmd.append('-')
+    start = time.time()
+    process = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+    process.stdin.write(constraint)
+    process.stdin.close()
+    output = process.stdout.read()
+    # wait4 gives the resource usage of this child only. It reaps the child, so
+    # the exit status is handed back to process (Popen would wait on it again)
+    pid, status, usage = os.wait4(process.pid, 0)
+    process.returncode = -os.WTERMSIG(status) if os.WIFSIGNALED(status) else os.WEXITSTATUS(status)
+    wall_time = time.time() - start
+    if process.returncode not in SUCCESS_EXIT_CODES:
+        return {'wall_time': wall_time, 'peak_memory_kb': usage.ru_maxrss, 'result': 'ERROR',
+                'exit_code': process.returncode}
+    clingo_json = json.loads(output)
+    times = clingo_json['Time']
+    solve_time = times.get('Solve', 0.0)
+    num_found = clingo_json['Models']['Number']
+    return {'ground_time'   : times['Total'] - solve_time, # parsing, grounding and preprocessing
+            'solve_time'    : solve_time,
+            'wall_time'     : wall_time,
+            'models'        : num_found,
+            'models_per_sec': num_found / solve_time if solve_time > 0 else 0.0,
+            'peak_memory_kb': usage.ru_maxrss,
+            'result'        : clingo_json['Result']}
+
+def runSuite(args, grid, heuristics, seeds):
+    runs = []
+    for config in expandGrid(grid):
+        for heuristic in heuristics:
+            for seed in seeds:
+                run = runClingo(args.lp_file, config, heuristic, seed, args.numModels, args.timeLimit)
+                run.update({'key': getRunKey(config, heuristic, seed), 'config': config, 'heuristic': heuristic, 'seed': seed})
+                if run['result'] == 'ERROR':
+                    print('%-70s %-13s clingo exit code %d' % (run['key'], run['result'], run['exit_code']))
+                else:
+                    print('%-70s %-13s ground %7.2fs  solve %7.2fs  %8d KB' % (run['key'], run['result'],
+                            run['ground_time'], run['solve_time'], run['peak_memory_kb']))
+                sys.stdout.flush()
+                runs.append(run)
+    return runs
+
+# @return list of strings describing each regression of results compared to baseline
+def findRegressions(runs, baseline_runs, tolerance, min_seconds):
+    baseline = dict([(run['key'], run) for run in baseline_runs])
+    regressions = []
+    for run in runs:
+        old_run = baseline.get(run['key'])
+        if old_run is None or 'ERROR' in [run['result'], old_run['result']]: # failed runs have no timings
+            continue
+        if run['result'] != old_run['result']:
+            regressions.append('%s: result changed %s -> %s' % (run['key'], old_run['result'], run['result']))
+        for metric in TIME_METRICS:
+            # small absolute differences are noise
+            if run[metric] > old_run[metric] * (1 + tolerance) and run[metric] - old_run[metric] > min_seconds:
+                regressions.append('%s: %s %.2fs -> %.2fs' % (run['key'], metric, old_run[metric], run[metric]))
+        if run['peak_memory_kb'] > old_run['peak_memory_kb'] * (1 + tolerance):
+            regressions.append('%s: peak memory %d KB -> %d KB' % (run['key'], old_run['peak_memory_kb'], run['peak_memory_kb']))
+    return regressions
+
+def readJSONFile(file_name):
+    json_file = open(file_name, 'r')
+    json_obj = json.load(json_file)
+    json_file.close()
+    return json_obj
+
+def main(args):
+    grid = readJSONFile(args.grid) if args.grid else DEFAULT_GRID
+    heuristics = [None] + [heur for heur in args.heuristics.split(',') if heur]
+    seeds = [int(seed) for seed in args.seeds.split(',')]
+
+    runs = runSuite(args, grid, heuristics, seeds)
+    num_errors = len([run for run in runs if run['result'] == 'ERROR'])
+    if num_errors:
+        print('%d of %d clingo runs failed, they are left out of the comparison' % (num_errors, len(runs)))
+    results = {'grid': grid, 'heuristics': heuristics, 'seeds': seeds, 'num_models': args.numModels,
+            'time_limit': args.timeLimit, 'date': time.strftime('%Y-%m-%d %H:%M:%S'), 'runs': runs}
+    out_file = open(args.output, 'w')
+    json.dump(results, out_file, indent=1, sort_keys=True)
+    out_file.close()
+
+    if args.baseline and os.path.exists(args.baseline):
+        regressions = findRegressions(runs, readJSONFile(args.baseline)['runs'], args.tolerance, args.minSeconds)
+        print('%d regressions compared to %s' % (len(regressions), args.baseline))
+        for regression in regressions:
+            print('REGRESSION ' + regression)
+        if regressions:
+            sys.exit(1)
+
+def getCmdLineArgs():
+    cmd_parser = argparse.ArgumentParser(description='benchmark the encoding over a grid of constants')
+    cmd_parser.add_argument('--lp_file', default='eqn_generator.lp', required=False)
+    cmd_parser.add_argument('--grid', default=None, required=False) # json file: constant name --> list of values
+    cmd_parser.add_argument('--heuristics', default='', required=False) # comma separated heuristic targets
+    cmd_parser.add_argument('--seeds', default=','.join(map(str, DEFAULT_SEEDS)), required=False)
+    cmd_parser.add_argument('--numModels', type=int, default=1, required=False)
+    cmd_parser.add_argument('--timeLimit', type=int, default=600, required=False) # seconds per clingo run
+    cmd_parser.add_argument('--output', default='benchmark_results.json', required=False)
+    cmd_parser.add_argument('--baseline', default=None, required=False) # earlier results file to compare against
+    cmd_parser.add_argument('--tolerance', type=float, default=0.2, required=False) # allowed relative slowdown
+    cmd_parser.add_argument('--minSeconds', type=float, default=0.1, required=False) # ignore smaller slowdowns
+    return cmd_parser.parse_args()
+
+if __name__ == "__main__":
+    main(getCmdLineArgs())
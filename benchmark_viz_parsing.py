@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+#
+# Author:   Armando Diaz Tolentino <ajdt@cs.washington.edu>
+#
+# Desc:     Compares the two ways eqn_viz.AnswerSetParser matches atoms against
+#           its grammars, on recorded clingo output (clingo --outf=2):
+#               'pyparsing' tries every grammar in turn (parseWithGrammars)
+#               'dispatch'  looks up the grammars by predicate name (PredicateDispatcher)
+#           Both must give the same parser and tokens for every atom.
+#               clingo eqn_generator.lp -n 20 --outf=2 > recorded.json
+#               python benchmark_viz_parsing.py recorded.json
+#           NOTE: eqn_viz reads list_of_heuristics.txt on import (see make_heur_list.sh)
+#
+import sys
+import time
+import argparse
+import witness_reader
+import eqn_viz
+
+# same steps as AnswerSetParser.parseAnsSetFromPredicates(): all_parsers first, factor_parsers for misses
+def parseWithPyparsing(predicate):
+    parser, tokens = eqn_viz.parseWithGrammars(predicate, eqn_viz.all_parsers)
+    if parser is None:
+        parser, tokens = eqn_viz.parseWithGrammars(predicate, eqn_viz.factor_parsers)
+    return parser, list(tokens)
+
+def parseWithDispatch(predicate):
+    parser, tokens = eqn_viz.PREDICATE_DISPATCHER.parse(predicate, eqn_viz.all_parsers)
+    if parser is None:
+        parser, tokens = eqn_viz.PREDICATE_DISPATCHER.parse(predicate, eqn_viz.factor_parsers)
+    return parser, list(tokens)
+
+# @return list of atoms (underscores removed) of every witness in the file
+def readAtoms(file_name):
+    clingo_file = open(file_name, 'r')
+    atoms = []
+    for witness in witness_reader.WitnessReader(clingo_file).witnesses():
+        atoms += witness_reader.stripUnderscores(witness['Value'])
+    clingo_file.close()
+    return atoms
+
+# @return (seconds, list of results) for parsing every atom repeat times
+def timeParser(parse_fnc, atoms, repeat):
+    start = time.time()
+    for rep in range(repeat):
+        results = [parse_fnc(atom) for atom in atoms]
+    return time.time() - start, results
+
+def main(args):
+    atoms = readAtoms(args.clingo_output)
+    pyparsing_time, expected = timeParser(parseWithPyparsing, atoms, args.repeat)
+    dispatch_time, results = timeParser(parseWithDispatch, atoms, args.repeat)
+    mismatches = [atom for atom, exp, res in zip(atoms, expected, results) if exp[0] is not res[0] or exp[1] != res[1]]
+    for atom in mismatches[:10]:
+        print('mismatch: %s' % atom)
+    num_matched = len([result for result in results if result[0] is not None])
+    print('%d atoms (%d match a grammar), %d repetitions' % (len(atoms), num_matched, args.repeat))
+    for name, seconds in [('pyparsing', pyparsing_time), ('dispatch', dispatch_time)]:
+        print('%-10s %8.3fs  %8.1f atoms/ms' % (name, seconds, len(atoms) * args.repeat / (1000.0 * seconds)))
+    print('speedup %.1fx, %d mismatches' % (pyparsing_time / dispatch_time, len(mismatches)))
+    return 1 if mismatches else 0
+
+def getCmdLineArgs():
+    cmd_parser = argparse.ArgumentParser(description='benchmark eqn_viz predicate parsing')
+    cmd_parser.add_argument('clingo_output') # clingo json output
+    cmd_parser.add_argument('--repeat', type=int, default=1, required=False)
+    return cmd_parser.parse_args()
+
+if __name__ == "__main__":
+    sys.exit(main(getCmdLineArgs()))
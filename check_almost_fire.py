@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+#
+# Author:   Armando Diaz Tolentino <ajdt@cs.washington.edu>
+#
+# Desc:     Checks that the 'almost fire' explanations clingo derives with almost_fire.lp
+#           (see make_almost_fire_rules.py) are the ones the search in Python finds, on
+#           recorded witnesses of all_solutions.lp:
+#               clingo all_solutions.lp prob.lp -n 0 --outf=2 > witnesses.json
+#               python check_almost_fire.py witnesses.json
+#           For every step of every witness, the sentences the visualizer makes from the
+#           _almostApplicable atoms are compared with the sentences of the Python search
+#           over the step's other atoms. Re-run it whenever almost_fire.lp is regenerated.
+#
+#           The Python search is the one the visualizer used before almost_fire.lp, with
+#           the semantics of the generated rules: negated conditions must not hold, and
+#           the missing condition must not hold for the values of the other conditions.
+#           Combinations make_almost_fire_rules.py skips aren't searched.
+#
+import re
+import sys
+import argparse
+from collections import defaultdict
+import witness_reader
+import pred_parser
+import explanation_extractor as explain
+import make_almost_fire_rules as rule_gen
+from model_manager import TimePartitionedModel
+from totally_new_visualizer import EquationStepParser
+
+CONST_REGEX = re.compile(r'#const\s+(\w+)\s*=\s*([^.]+)\.')
+
+# @return dictionary constant name --> value (without underscores, like the model's atoms)
+def readConstants(lp_file):
+    lp_obj = open(lp_file, 'r')
+    constants = dict([(name, ''.join(value.split()).replace('_', '')) for name, value in CONST_REGEX.findall(lp_obj.read())])
+    lp_obj.close()
+    return constants
+
+# @return pred_key of a condition, as stored by ModelManager
+def getModelKey(cond):
+    return (cond.name.replace('_', ''), cond.arity)
+
+# @return list with the value of every argument, None for unassigned variables
+def getArgValues(args, assign, constants):
+    return [assign.get(arg) if rule_gen.isVariable(arg) else constants.get(arg, arg) for arg in args]
+
+def condHolds(cond, assign, view, constants):
+    return len(view.unify(getModelKey(cond), getArgValues(cond.args, assign, constants))) > 0
+
+##
+# match the positive conditions in body order
+# @return list of every assignment of the variables of conditions
+def findAssignments(conditions, assign, view, constants):
+    if len(conditions) == 0:
+        return [assign]
+    cond, all_assign = conditions[0], []
+    for grounding in view.unify(getModelKey(cond), getArgValues(cond.args, assign, constants)):
+        new_assign = dict(assign)
+        new_assign.update([(arg, value) for arg, value in zip(cond.args, grounding) if rule_gen.isVariable(arg)])
+        all_assign += findAssignments(conditions[1:], new_assign, view, constants)
+    return all_assign
+
+##
+# @return set of (heur_name, operands, missing condition name, missing values) for the
+#       heuristics that almost fire in view, as found by the search in Python
+def findAlmostFire(view, constants):
+    template_mgr = explain.getTemplateManager()
+    almost_fire  = set()
+    for heur_name, heur_key in template_mgr.heuristic_to_heur_key.items():
+        level_two_preds = explain.getLevelTwoPredicates(heur_key)
+        # rule head looks like : _applicable(T, _rule(HeurName, _operands(..)))
+        operand_vars = template_mgr.lookupTemplateFor(heur_key).rule.head.args[1].args[1].args
+        for excluded, other_cond in explain.makeListOfAlmostFireConditions(level_two_preds):
+            if rule_gen.makeAlmostApplicableRules(heur_name, operand_vars, excluded, other_cond, 0)[0].startswith('%'):
+                continue # skipped by make_almost_fire_rules.py
+            positive = [cond for cond in other_cond if isinstance(cond, rule_gen.par.Predicate)]
+            negated  = [cond for cond in other_cond if isinstance(cond, rule_gen.par.NegPredicate)]
+            if rule_gen.TIME_VARIABLE not in sum([rule_gen.getVariables(cond) for cond in positive], []):
+                positive.insert(0, rule_gen.par.Predicate(rule_gen.TIME_DOMAIN, [rule_gen.TIME_VARIABLE], 1))
+            for assign in findAssignments(positive, {}, view, constants):
+                if any([condHolds(cond, assign, view, constants) for cond in negated + [excluded]]):
+                    continue
+                almost_fire.add((heur_name, tuple(getArgValues(operand_vars, assign, constants)),
+                                    excluded.name, tuple(getArgValues(excluded.args, assign, constants))))
+    return almost_fire
+
+# @return dictionary strategy --> sorted list of sentences, from the search in Python
+def makePythonSentences(view, constants):
+    sentences = defaultdict(list)
+    for heur_name, operands, missing_name, missing_values in findAlmostFire(view, constants):
+        sentences[explain.heuristic_to_strategy[heur_name]].append(
+                explain.makeAlmostFireSentences(heur_name, operands, missing_name, missing_values))
+    return dict([(strat, sorted(sent)) for strat, sent in sentences.items()])
+
+# @return dictionary strategy --> sorted list of sentences, from the _almostApplicable atoms
+def makeASPSentences(almost_applicable):
+    step_parser = EquationStepParser()
+    for pred_obj in almost_applicable:
+        step_parser.addAlmostApplicablePredicate(pred_obj)
+    # addAlmostApplicablePredicate() appends the two sentences of every atom
+    return dict([(strat, sorted([sent[index:index+2] for index in range(0, len(sent), 2)]))
+                    for strat, sent in step_parser.almost_fire.items()])
+
+# @return number of steps whose explanations differ
+def checkWitness(witness, constants):
+    model = TimePartitionedModel()
+    almost_applicable = defaultdict(list) # step --> _almostApplicable predicates
+    term_table = pred_parser.TermTable()
+    for predicate_string in witness_reader.stripUnderscores(witness['Value']):
+        pred_obj = pred_parser.predicateStringToParsedPredicate(predicate_string, term_table)
+        if pred_obj.name == 'almostApplicable':
+            almost_applicable[pred_parser.getTimeFromPredObject(pred_obj).step].append(pred_obj)
+        else:
+            model.addParsedPredicate(pred_obj)
+    num_mismatches = 0
+    for step in sorted(set([time_obj.step for time_obj in model.partitions.keys()])):
+        expected = makePythonSentences(model.getStepView(step), constants)
+        found    = makeASPSentences(almost_applicable[step])
+        if expected != found:
+            num_mismatches += 1
+            print('step %d: %d sentence pairs from almost_fire.lp, %d from the Python search'
+                    % (step, sum(map(len, found.values())), sum(map(len, expected.values()))))
+    return num_mismatches
+
+def main(args):
+    constants = readConstants(args.const_file)
+    num_witnesses = num_mismatches = 0
+    for witness_file in args.clingo_output:
+        file_obj = open(witness_file, 'r')
+        for witness in witness_reader.WitnessReader(file_obj).witnesses():
+            num_mismatches += checkWitness(witness, constants)
+            num_witnesses += 1
+        file_obj.close()
+    print('%d witnesses checked, %d steps differ' % (num_witnesses, num_mismatches))
+    return 1 if num_mismatches else 0
+
+def getCmdLineArgs():
+    cmd_parser = argparse.ArgumentParser(description='compare almost_fire.lp with the almost fire search in Python')
+    cmd_parser.add_argument('clingo_output', nargs='+') # clingo json output
+    cmd_parser.add_argument('--const_file', default='nodes.lp', required=False) # defines leftSide and rightSide
+    return cmd_parser.parse_args()
+
+if __name__ == "__main__":
+    sys.exit(main(getCmdLineArgs()))
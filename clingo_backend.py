@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+#
+# Author:   Armando Diaz Tolentino <ajdt@cs.washington.edu>
+#
+# Desc:     Runs clingo in-process via its python module. Models are handed
+#           to a callback as soon as the solver finds them (as clingo Symbols),
+#           so we never serialize to JSON and parse the output back in. The
+#           visualizers read the Symbols directly (AnswerSetManager.addModelSymbols()).
+#
+import time
+import clingo
+import solver_stats
+import arithmetic_propagator
+
+# clingo options that only make sense for the command line application,
+# clingo.Control rejects them
+APPLICATION_ONLY_OPTIONS = ['--outf', '--text', '--stats', '--verbose', '-V', '--quiet', '-q']
+
+# @param bash_cmd a clingo command line like "clingo eqn_generator.lp -n 0 --outf=2"
+# @return a pair (list_of_lp_files, list_of_control_args)
+def splitClingoCommand(bash_cmd):
+    lp_files, control_args = [], []
+    tokens = bash_cmd.split()
+    if tokens and tokens[0] == 'clingo':
+        tokens = tokens[1:]
+    while tokens:
+        token = tokens.pop(0)
+        if token.endswith('.lp'):
+            lp_files.append(token)
+        elif token == '--outf' and tokens: # value given as a separate token
+            tokens.pop(0)
+        elif token.split('=')[0] not in APPLICATION_ONLY_OPTIONS:
+            control_args.append(token)
+    return lp_files, control_args
+
+class SolveTimeout(Exception):
+    """raised when a solve call is cancelled because it ran out of time"""
+    pass
+
+class InProcessSolver(object):
+    """wraps a clingo.Control object, grounds the given files and streams models to a callback"""
+    # @param arithmetic if True, coefficient arithmetic is done by arithmetic_propagator.py during search
+    def __init__(self, lp_files, control_args=[], arithmetic=False):
+        super(InProcessSolver, self).__init__()
+        self.context = None # @-functions used while grounding
+        if arithmetic:
+            control_args = list(control_args) + arithmetic_propagator.getControlArgs()
+        self.control = clingo.Control(list(control_args))
+        if arithmetic:
+            self.context = arithmetic_propagator.registerWith(self.control)
+        for lp_file in lp_files:
+            self.control.load(lp_file)
+        self.grounded = False
+        self.ground_time = 0.0
+
+    def add(self, program_text, part='base', params=[]):
+        self.control.add(part, list(params), program_text)
+
+    def ground(self, parts=[('base', [])]):
+        start = time.time()
+        self.control.ground(parts, context=self.context)
+        self.ground_time += time.time() - start
+        self.grounded = True
+
+    # @param solve_result the value returned by solve()
+    # @return solver_stats.SolverStatistics for the last solve call (ground time is for all ground calls)
+    def getStatistics(self, solve_result):
+        return solver_stats.statsFromControl(self.control, self.ground_time, solve_result)
+
+    def assignExternal(self, symbol, truth_value):
+        self.control.assign_external(symbol, truth_value)
+
+    # @param on_model function called with the list of shown Symbols of every model found
+    # @param assumptions list of (Symbol, bool) pairs passed on to clingo
+    # @param timeout seconds before the search is cancelled (SolveTimeout is raised), None waits forever
+    # @return clingo.SolveResult for the call
+    def solve(self, on_model, assumptions=[], timeout=None):
+        if not self.grounded:
+            self.ground()
+        model_callback = lambda model: on_model(model.symbols(shown=True))
+        if timeout is None:
+            return self.control.solve(assumptions=list(assumptions), on_model=model_callback)
+        handle = self.control.solve(assumptions=list(assumptions), on_model=model_callback, async_=True)
+        if not handle.wait(timeout):
+            handle.cancel()
+            handle.wait()
+            raise SolveTimeout('no result after %.1f seconds' % timeout)
+        return handle.get()
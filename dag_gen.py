@@ -1,8 +1,8 @@
 import subprocess
-import tempfile # for temporarily saving piped output from clingo
 import sys
 import argparse
 import eqn_viz
+import solver_stats
 import pygraphviz as pgv
 
 class ClingoRunner:
@@ -10,7 +10,8 @@ class ClingoRunner:
     BASH_COMMAND = "clingo eqn_generator.lp --project -n 0 --outf=2 "
     TEST_COMMAND = "cat three_steps_output" # used for testing, for faster turnaround
 
-    BOOLEAN_FLAGS = ['iterative', 'json']
+    BOOLEAN_FLAGS = ['iterative', 'json', 'inprocess', 'incremental', 'arithmetic']
+    RUNNER_PARAMS = {'metricsLog': 'None'} # options of the runner itself, not passed on to clingo
     def __init__(self, bash_cmd=BASH_COMMAND, flags=BOOLEAN_FLAGS, misc_params=dict()):
         self.bash_cmd   =   bash_cmd
         self.boolean_flags = flags
@@ -32,21 +33,24 @@ class ClingoRunner:
             cmd_parser.add_argument('--' + flag, action='store_true')
 
         # add more params as required
-        for param, default_value in self.misc_params.items():
+        for param, default_value in self.misc_params.items() + ClingoRunner.RUNNER_PARAMS.items():
             cmd_parser.add_argument('--'+param, default=default_value, required=False)
         return cmd_parser
 
-    def writeSolverConfigFile(self, param_dict, filename='config_params.lp', misc_constraints=''):
-        solver_file = open(filename, 'w')
+    def getConstantArgs(self, param_dict):
+        """ return clingo options (-c param=value) overriding the #const values in config_params.lp
+            NOTE: we don't write config_params.lp, so several runs can share a checkout"""
+        const_args = []
         for (param, value) in param_dict.items():
-            if param not in self.boolean_flags and param not in self.misc_params:
-                solver_file.write('#const ' + param + ' = ' + value +'.\n')
+            if param not in self.boolean_flags and param not in self.misc_params and param not in ClingoRunner.RUNNER_PARAMS:
+                const_args += ['-c', param + '=' + value]
+        return const_args
 
+    def getMiscConstraints(self, param_dict):
+        """ return additional asp code (e.g. constraints) for a single run"""
         # also write overflow constraints
-        # solver_file.write(':- _coeffOverflow.\n')
-        # solver_file.write(':- _degOverflow.\n')
-        solver_file.write(misc_constraints)
-        solver_file.close()
+        # return ':- _coeffOverflow.\n:- _degOverflow.\n'
+        return ''
 
     def runSolver(self, make_graph=True):
         # write the config file needed to run the program
@@ -79,38 +83,76 @@ class ClingoRunner:
 
     def iterativeDeepeningGeneration(self, param_dict):
         """ return a list of AnswerSetManager instances"""
+        if param_dict.get('incremental'):
+            return self.incrementalDeepeningGeneration(param_dict)
         ans_set_manager_list = []
         for num_steps in range(1, int(param_dict['maxSteps']) + 1):
             param_dict['maxSteps'] = str(num_steps)
             ans_set_manager_list.append(self.computeAnsSets(param_dict))
         return ans_set_manager_list
 
+    def incrementalDeepeningGeneration(self, param_dict):
+        """ same as iterativeDeepeningGeneration(), but grounds one more time step per iteration
+            on a single clingo.Control object instead of re-grounding everything"""
+        import clingo_backend, incremental_solver # NOTE: imported here, clingo's python module is only needed with --incremental
+        lp_files, control_args = clingo_backend.splitClingoCommand(self.bash_cmd)
+        control_args += self.getConstantArgs(param_dict)
+        solver = incremental_solver.IncrementalSolver(lp_files[0], control_args)
+        ans_set_manager_list = []
+        for num_steps in range(1, int(param_dict['maxSteps']) + 1):
+            manager = eqn_viz.AnswerSetManager({}) # NOTE: we're not passing any cmd line args
+            solve_result = solver.solveForSteps(num_steps, manager.addModelSymbols)
+            manager.solver_stats = solver.solver.getStatistics(solve_result)
+            self.logStatistics(manager, dict(param_dict, maxSteps=str(num_steps)))
+            ans_set_manager_list.append(manager)
+        return ans_set_manager_list
+
     def computeAnsSets(self, param_dict):
         """ run clingo with param_dict options, and return the resulting AnswerSetManager instance"""
-        self.writeSolverConfigFile(param_dict)
-        # run the process
-        process = subprocess.Popen(self.bash_cmd.split(), stdout=subprocess.PIPE)
-        output = process.communicate()[0]
-        return self.parseGeneratedProblems(output)
-
-    def parseGeneratedProblems(self, json_output):
-        """ parse output string with AnswerSetManager and return the manager"""
-        # set stdin to be json_output
-        # NOTE: eqn_viz.AnswerSetManager can only read from file or from stdin, so
-        # we save output to a temporary file and set it to stdin
-        old_stdin = sys.stdin
-        temp_file = tempfile.TemporaryFile(mode='w+')
-        temp_file.write(json_output)
-        temp_file.seek(0) # file obj only has one file pointer (go to start of file for reading)
-        sys.stdin = temp_file
-
-        # initialize manager
+        if param_dict.get('inprocess') or param_dict.get('arithmetic'): # the propagator needs the python module
+            return self.computeAnsSetsInProcess(param_dict)
+        # run the process, misc constraints are passed via stdin ('-' input file)
+        cmd = self.bash_cmd.split() + self.getConstantArgs(param_dict)
+        misc_constraints = self.getMiscConstraints(param_dict)
+        if misc_constraints:
+            cmd.append('-')
+        if '--stats' not in cmd:
+            cmd.append('--stats')
+        process = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        process.stdin.write(misc_constraints)
+        process.stdin.close()
+        # parse witnesses while clingo is still writing them, the output is never held in memory
+        manager = self.parseGeneratedProblems(process.stdout)
+        process.wait()
+        self.logStatistics(manager, param_dict)
+        return manager
+
+    def computeAnsSetsInProcess(self, param_dict):
+        """ run clingo through its python module, each model is parsed as soon as it's found"""
+        import clingo_backend # NOTE: imported here, clingo's python module is only needed with --inprocess/--arithmetic
         manager = eqn_viz.AnswerSetManager({}) # NOTE: we're not passing any cmd line args
-        manager.initFromSTDIN()
+        lp_files, control_args = clingo_backend.splitClingoCommand(self.bash_cmd)
+        solver = clingo_backend.InProcessSolver(lp_files, control_args + self.getConstantArgs(param_dict),
+                arithmetic=param_dict.get('arithmetic'))
+        solver.add(self.getMiscConstraints(param_dict))
+        solve_result = solver.solve(manager.addModelSymbols)
+        manager.solver_stats = solver.getStatistics(solve_result)
+        self.logStatistics(manager, param_dict)
+        return manager
 
-        # set stdin to old value
-        sys.stdin = old_stdin
+    def logStatistics(self, manager, param_dict):
+        """ append the solver statistics of manager to the metrics log, if one was given"""
+        if param_dict.get('metricsLog', 'None') == 'None' or manager.solver_stats is None:
+            return
+        params = dict([(param, value) for param, value in param_dict.items() if param != 'metricsLog'])
+        solver_stats.appendToMetricsLog(param_dict['metricsLog'], manager.solver_stats,
+                {'command': self.bash_cmd.strip(), 'params': params})
 
+    def parseGeneratedProblems(self, clingo_output):
+        """ parse clingo json output (a file object) with AnswerSetManager and return the manager"""
+        manager = eqn_viz.AnswerSetManager({}) # NOTE: we're not passing any cmd line args
+        summary = manager.initFromClingoOutput(clingo_output)
+        manager.solver_stats = solver_stats.statsFromClingoJSON(summary)
         return manager
 
 
@@ -1,36 +1,53 @@
 from dag_gen import *
 import eqn_viz
+
+# @param heuristics space separated heuristic names, one for each step
+# @return list of atoms (strings) that must hold for the heuristic sequence to be used
+def getHeuristicSequenceAtoms(heuristics):
+	if heuristics == '':
+		return []
+	heur_atoms = []
+	for step, heur in enumerate(heuristics.split(' ')):
+		time_step = '_time(' + str(step) + ',1)'
+		heur_atoms.append('_selectedHeuristic(' + time_step + ', ' + heur + ')')
+	return heur_atoms
+
+# @param features list of (rule, feature, value) triples
+# @return list of atoms (strings) that must hold for the required features
+def getFeatureAtoms(features):
+	feature_atoms = []
+	for rule, feature, value in features:
+		feature_atoms.append('ruleFeature('+rule+',' + feature +',' + value +')')
+	return feature_atoms
+
+# @param features_file file with one 'rule feature value' triple per line
+# @return list of atoms (strings) that must hold for the required features
+def getRequiredFeatureAtoms(features_file):
+	req_file = open(features_file, 'r')
+	features = [line.split() for line in req_file]
+	req_file.close()
+	return getFeatureAtoms(features)
+
 class DemoRunner(ClingoRunner):
 	"""Run clingo based on command line arguments"""
 	BASE_COMMAND = "clingo eqn_generator.lp --outf=2 "
 	additional_params = { 'heurSeq' :  '', 'numSets': '1' , 'clingo' : '', 'random' : 'false', 'featuresFile' : 'None', 'json_output': 'true'}
 	def __init__(self):
 		self.cmd_line_args = []
-		ClingoRunner.__init__(self, DemoRunner.BASE_COMMAND, flags=[], misc_params=DemoRunner.additional_params)
+		ClingoRunner.__init__(self, DemoRunner.BASE_COMMAND, flags=['inprocess'], misc_params=DemoRunner.additional_params)
 
 	def getHeuristicSequence(self, param_dict):
 		if param_dict['heurSeq'] == '':
 			return ''
-		heuristics = param_dict['heurSeq']
-		heur_list = []
-		for step, heur in enumerate(heuristics.split(' ')):
-			time_step = '_time(' + str(step) + ',1)'
-			heur_list.append(':- not selectedHeuristic(' + time_step + ', ' + heur + ').')
-		return '\n'.join(heur_list) + '\n'
+		return ''.join([':- not ' + atom + '.\n' for atom in getHeuristicSequenceAtoms(param_dict['heurSeq'])])
 
 	def getRequiredFeatures(self, param_dict):
 		if param_dict['featuresFile'] == 'None':
 			return ''
-		req_file = open(param_dict['featuresFile'], 'r')
-		requirements_str = ''
-		for line in req_file:
-			rule, feature, value = line.split()
-			requirements_str += ':- not ruleFeature('+rule+',' + feature +',' + value +').'
-		return requirements_str
+		return ''.join([':- not ' + atom + '.' for atom in getRequiredFeatureAtoms(param_dict['featuresFile'])])
 
-	def writeSolverConfigFile(self, param_dict, filename='config_params.lp'):
-		heur_and_features = self.getHeuristicSequence(param_dict) + '\n' + self.getRequiredFeatures(param_dict)
-		ClingoRunner.writeSolverConfigFile(self, param_dict, filename, misc_constraints=heur_and_features)
+	def getMiscConstraints(self, param_dict):
+		return self.getHeuristicSequence(param_dict) + '\n' + self.getRequiredFeatures(param_dict)
 
 	def getClingoFlags(self, param_dict):
 		flags = ''
@@ -48,6 +65,55 @@ class DemoRunner(ClingoRunner):
 		self.bash_cmd += self.getClingoFlags(param_dict)
 		ClingoRunner.runSolver(self, make_graph=False)
 
+class DemoQuerySolver(object):
+	"""Grounds eqn_generator.lp once. Each request (heurSeq/featuresFile, same format as DemoRunner)
+	is answered by a solve call with assumptions instead of constraints and a new grounding"""
+	def __init__(self, lp_file='eqn_generator.lp', control_args=[]):
+		super(DemoQuerySolver, self).__init__()
+		import clingo_backend # NOTE: imported here, clingo's python module is only needed for in-process requests
+		self.solver = clingo_backend.InProcessSolver([lp_file], control_args)
+		self.solver.ground()
+		solver_config = self.solver.control.configuration.solver
+		self.default_seed, self.default_sign_def = solver_config.seed, solver_config.sign_def
+
+	# @param features (rule, feature, value) triples required on top of the ones in features_file
+	# @return list of (Symbol, True) assumptions, raises ValueError for an atom that isn't in the
+	#		ground program (a misspelled heuristic, a step past maxSteps, an unknown feature),
+	#		assuming it would silently make the request unsatisfiable
+	def getAssumptions(self, heur_seq='', features_file='None', features=()):
+		import clingo
+		atoms = getHeuristicSequenceAtoms(heur_seq) + getFeatureAtoms(features)
+		if features_file != 'None':
+			atoms += getRequiredFeatureAtoms(features_file)
+		assumptions = []
+		for atom in atoms:
+			symbol = clingo.parse_term(atom)
+			if self.solver.control.symbolic_atoms[symbol] is None:
+				raise ValueError('unknown atom ' + atom + ', it is not in the ground program')
+			assumptions.append((symbol, True))
+		return assumptions
+
+	# a seed picks random answer sets (same as DemoRunner's random option), None restores the defaults
+	def setSeed(self, seed=None):
+		solver_config = self.solver.control.configuration.solver
+		if seed is None:
+			solver_config.seed, solver_config.sign_def = self.default_seed, self.default_sign_def
+		else:
+			solver_config.seed, solver_config.sign_def = str(seed), 'rnd'
+
+	# @param manager answer set manager to add the answer sets to, defaults to a new eqn_viz.AnswerSetManager
+	# @param timeout seconds before the request fails with clingo_backend.SolveTimeout, None waits forever
+	# @param features see getAssumptions()
+	# @return the manager holding up to num_sets answer sets (0 means all)
+	def solveRequest(self, heur_seq='', features_file='None', num_sets='1', manager=None, seed=None, timeout=None, features=()):
+		self.solver.control.configuration.solve.models = str(num_sets)
+		self.setSeed(seed)
+		if manager is None:
+			manager = eqn_viz.AnswerSetManager({})
+		solve_result = self.solver.solve(manager.addModelSymbols, self.getAssumptions(heur_seq, features_file, features), timeout)
+		manager.solver_stats = self.solver.getStatistics(solve_result)
+		return manager
+
 if __name__ == "__main__":
 	DemoRunner().runSolver()
 		
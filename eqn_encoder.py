@@ -0,0 +1,229 @@
+#!/usr/bin/env python
+#
+# Author:   Armando Diaz Tolentino <ajdt@cs.washington.edu>
+#
+# Desc:     Encodes an equation string, like '3x^2+4=x', as the initial state of
+#           a problem: the _holds facts for time step 0 on the expression tree
+#           layout of nodes.lp. This is the inverse of EquationStepParser.makeEqnString(),
+#           so a known equation can be solved directly instead of generated:
+#               python eqn_encoder.py '3x^2+4=x' | clingo all_solutions.lp - --project -n 0
+#               python eqn_encoder.py --file equations.txt | python batch_solve.py -
+#           Parentheses group the children of a node, like in makeEqnString():
+#           'x+2+3' is one add node with three children, '(x+2)+3' is an add node
+#           with an add child. Subtracting a monomial adds its negation, other
+#           subtrahends get a neg node.
+#
+import re
+import sys
+import argparse
+from collections import namedtuple
+
+# same as config_params.lp, can be overridden like clingo constants (-c maxDepth=4)
+DEFAULT_CONSTANTS = {'maxDepth': 3, 'maxChildren': 4, 'maxInitialCoeff': 5, 'maxInitialDeg': 2, 'nodeBudget': 0}
+MAX_CHILDREN_AT_DEPTH = {1: 3, 2: 3, 3: 3, 4: 2} # _maxChildrenAtDepth in nodes.lp
+ROOT_NODES = [(1, 1), (1, 2)] # leftSide, rightSide
+TOKEN_RE = re.compile(r'\s*(?:(\d+)|([a-zA-Z])|(\S))')
+
+# a node of the parsed expression tree, coeff and degree are only used by mono nodes
+ExprNode = namedtuple('ExprNode', ['type', 'children', 'coeff', 'degree'])
+
+# @param clingo_args clingo options, constants are given as '-c name=value' or '--const=name=value'
+# @return dictionary of constant name --> integer value, defaults from config_params.lp
+def getConstants(clingo_args=[]):
+    constants = dict(DEFAULT_CONSTANTS)
+    for index, arg in enumerate(clingo_args):
+        if arg == '-c' and index + 1 < len(clingo_args):
+            definition = clingo_args[index + 1]
+        elif arg.startswith('--const='):
+            definition = arg[len('--const='):]
+        else:
+            continue
+        name, value = definition.split('=', 1)
+        constants[name.strip()] = int(value)
+    return constants
+
+# @return dictionary depth --> number of nodes with child slots, the same
+#       layers as _numParentsAtDepth in nodes.lp (every node if there is no budget)
+def getNumParentsAtDepth(constants):
+    num_parents, layer_size, nodes_before = {}, 2, 0
+    for depth in range(1, constants['maxDepth']):
+        num_children = MAX_CHILDREN_AT_DEPTH.get(depth, 0)
+        budget = constants['nodeBudget']
+        if budget == 0 or nodes_before + layer_size + layer_size * num_children <= budget:
+            num_parents[depth] = layer_size
+        else:
+            num_parents[depth] = max(0, (budget - nodes_before - layer_size) // max(1, num_children))
+        nodes_before += layer_size
+        layer_size = num_parents[depth] * num_children
+    return num_parents
+
+def makeNode(node_type, children):
+    return children[0] if len(children) == 1 else ExprNode(node_type, children, None, None)
+
+def negate(node):
+    if node.type == 'mono':
+        return node._replace(coeff=-node.coeff)
+    return ExprNode('neg', [node], None, None)
+
+class EquationParser(object):
+    """recursive descent parser for the equation strings written by makeEqnString()"""
+    def __init__(self, eqn_string, var_str='x'):
+        super(EquationParser, self).__init__()
+        self.eqn_string = eqn_string
+        self.var_str    = var_str
+        self.tokens     = [match.group().strip() for match in TOKEN_RE.finditer(eqn_string) if match.group().strip()]
+        self.position   = 0
+
+    def peek(self):
+        return self.tokens[self.position] if self.position < len(self.tokens) else None
+
+    def next(self):
+        token = self.peek()
+        if token is None:
+            raise ValueError('unexpected end of equation %r' % self.eqn_string)
+        self.position += 1
+        return token
+
+    def expect(self, token):
+        if self.peek() != token:
+            raise ValueError('expected %r instead of %r in %r' % (token, self.peek(), self.eqn_string))
+        self.position += 1
+
+    # @return (left, right) ExprNode trees
+    def parseEquation(self):
+        left = self.parseSum()
+        self.expect('=')
+        right = self.parseSum()
+        self.expect(None)
+        return left, right
+
+    def parseSum(self):
+        terms = [self.parseProduct()]
+        while self.peek() in ['+', '-']:
+            operator = self.next()
+            term = self.parseProduct()
+            terms.append(term if operator == '+' else negate(term))
+        return makeNode('add', terms)
+
+    def parseProduct(self):
+        factors = [self.parseFactor()]
+        while self.peek() in ['*', '/']:
+            if self.next() == '*':
+                factors.append(self.parseFactor())
+            else: # everything so far is the numerator
+                factors = [ExprNode('div', [makeNode('mul', factors), self.parseFactor()], None, None)]
+        return makeNode('mul', factors)
+
+    def parseFactor(self):
+        token = self.peek()
+        if token == '(':
+            self.next()
+            expr = self.parseSum()
+            self.expect(')')
+            return expr
+        if token == '-':
+            self.next()
+            return negate(self.parseFactor())
+        return self.parseMonomial()
+
+    # monomials look like makeMonomialFromData() output: 4, x, 3x, x^2, 3x^2
+    def parseMonomial(self):
+        token = self.peek()
+        if token is None or not (token.isdigit() or token == self.var_str):
+            raise ValueError('unexpected %r in %r' % (token, self.eqn_string))
+        coeff, degree = 1, 0
+        if token.isdigit():
+            coeff = int(self.next())
+        if self.peek() == self.var_str:
+            self.next()
+            degree = 1
+            if self.peek() == '^':
+                self.next()
+                token = self.next()
+                if not token.isdigit():
+                    raise ValueError('degree %r is not a number in %r' % (token, self.eqn_string))
+                degree = int(token)
+        return ExprNode('mono', [], coeff, degree)
+
+# @return the _holds atom (no period) for a field of node_id at time step 0
+def makeHoldsAtom(node_id, field, value):
+    return '_holds(_time(0,1),_fact(_id(%d,%d),_nodeField(%s,%s)))' % (node_id + (field, value))
+
+# @param facts list of _holds atoms as returned by EquationEncoder.encode()
+# @return the contents of a .prob file for the facts
+def toProbString(facts):
+    return ''.join([fact + '.\n' for fact in facts])
+
+class EquationEncoder(object):
+    """encodes equation strings as initial state facts, encodings are cached"""
+    def __init__(self, constants=None, var_str='x'):
+        super(EquationEncoder, self).__init__()
+        self.constants  = getConstants() if constants is None else constants
+        self.var_str    = var_str
+        self.num_parents = getNumParentsAtDepth(self.constants)
+        self.cache      = {}
+
+    # @param eqn_string equation like '3x^2+4=x'
+    # @return tuple of _holds atoms (no periods), raises ValueError if the equation
+    #       can't be parsed or doesn't fit the expression tree
+    def encode(self, eqn_string):
+        key = ''.join(eqn_string.split())
+        if key not in self.cache:
+            left, right = EquationParser(key, self.var_str).parseEquation()
+            facts = []
+            for root, node_id in zip([left, right], ROOT_NODES):
+                self.encodeNode(root, node_id, facts)
+            self.cache[key] = tuple(facts)
+        return self.cache[key]
+
+    def encodeNode(self, node, node_id, facts):
+        depth, number = node_id
+        facts.append(makeHoldsAtom(node_id, 'active', 'yes'))
+        facts.append(makeHoldsAtom(node_id, 'type', node.type))
+        if node.type == 'mono': # same bounds as the initial monomials of prob_generator.lp
+            if abs(node.coeff) > self.constants['maxInitialCoeff']:
+                raise ValueError('coefficient %d is larger than maxInitialCoeff=%d' % (node.coeff, self.constants['maxInitialCoeff']))
+            if node.degree > self.constants['maxInitialDeg']:
+                raise ValueError('degree %d is larger than maxInitialDeg=%d' % (node.degree, self.constants['maxInitialDeg']))
+            facts.append(makeHoldsAtom(node_id, 'degree', node.degree))
+            facts.append(makeHoldsAtom(node_id, 'coeff', node.coeff))
+            return
+        if depth >= self.constants['maxDepth'] or number > self.num_parents.get(depth, 0):
+            raise ValueError('%s node at depth %d needs more than maxDepth=%d layers (or nodeBudget)'
+                    % (node.type, depth, self.constants['maxDepth']))
+        max_children = min(self.constants['maxChildren'], MAX_CHILDREN_AT_DEPTH.get(depth, 0))
+        if len(node.children) > max_children:
+            raise ValueError('%s node at depth %d has %d children, at most %d are allowed'
+                    % (node.type, depth, len(node.children), max_children))
+        # child ids as in _childNum of nodes.lp
+        for child_num, child in enumerate(node.children):
+            child_id = (depth + 1, (number - 1) * MAX_CHILDREN_AT_DEPTH[depth] + child_num + 1)
+            facts.append(makeHoldsAtom(node_id, 'activechild', '_id(%d,%d)' % child_id))
+            self.encodeNode(child, child_id, facts)
+
+def main(args):
+    encoder = EquationEncoder(getConstants(args.clingo.split()), args.var)
+    equations = list(args.equations)
+    if args.file:
+        eqn_file = open(args.file, 'r')
+        equations += [line.strip() for line in eqn_file if line.strip()]
+        eqn_file.close()
+    problems = []
+    for eqn_string in equations:
+        try:
+            problems.append(toProbString(encoder.encode(eqn_string)))
+        except ValueError as err: # report the equation, but keep going
+            sys.stderr.write('skipping %s: %s\n' % (eqn_string, err))
+    # an empty line separates problems (see batch_solve.py)
+    sys.stdout.write('\n'.join(problems))
+
+def getCmdLineArgs():
+    cmd_parser = argparse.ArgumentParser(description='encode equations as initial state facts')
+    cmd_parser.add_argument('equations', nargs='*')
+    cmd_parser.add_argument('--file', default=None, required=False) # one equation per line
+    cmd_parser.add_argument('--clingo', default='', required=False) # constants used for solving, e.g. '-c maxDepth=4'
+    cmd_parser.add_argument('--var', default='x', required=False)
+    return cmd_parser.parse_args()
+
+if __name__ == "__main__":
+    main(getCmdLineArgs())
@@ -21,6 +21,7 @@ import pdb
 from pyparsing import Word, alphas, nums, ParseException
 
 import explanation_extractor as explain
+import witness_reader
 
 # parse all heuristics from list_of_heuristics.txt file 
 # NOTE: assumes file exists and is complete: to generate file just run the command "bash make_heur_list.sh"
@@ -92,6 +93,113 @@ all_parsers     =   [ type_parser, child_parser, deg_coeff_parser, action_parser
 factor_parsers  =   [factora_parser, factorb_parser, factorc_parser, factord_parser, refer_to_Parser, soln_parser, substitute_parser]
 op_symbols      =   {'add' : '+' , 'div' : '/' , 'mul' : '*' , 'neg' : '-'}
 
+# Single dispatch parsing: trying every pyparsing grammar above on every atom is slow,
+# and most atoms don't match any of them. PredicateDispatcher looks up the grammars for
+# an atom's predicate name and splits the atom into tokens with one regular expression.
+# Tokens have the same layout as parseString() output: 'name(', words, numbers, ',' and ')'
+PREDICATE_TOKEN_RE  =   re.compile(r'\s*(\w+\(|[0-9-]+|\w+|\S)')
+NUMBER_TOKEN_RE     =   re.compile(r'[0-9-]+$')
+
+# token checks, same as Word(alphas), Word(nums) and Word(nums + '-') above
+isWordToken     =   lambda token: token.isalpha()
+isDigitsToken   =   lambda token: token.isdigit()
+isNumberToken   =   lambda token: NUMBER_TOKEN_RE.match(token) is not None
+
+time_tokens     =   ['time(', isDigitsToken, ',', isDigitsToken, ')']
+node_tokens     =   ['id(', isNumberToken, ',', isNumberToken, ')']
+holdsTokens     =   lambda value_tokens: (['holds('] + time_tokens + [',', 'fact('] + node_tokens
+                        + [',', 'nodeField(', isWordToken, ','] + value_tokens + [')', ')', ')'])
+timeNumberTokens =  lambda name, num_numbers: [name + '('] + time_tokens + [',', isNumberToken] * num_numbers + [')']
+
+# (grammar, token layout) for every parser in all_parsers and factor_parsers
+grammar_tokens  = [
+    (type_parser,               holdsTokens([isWordToken])),
+    (child_parser,              holdsTokens(node_tokens)),
+    (deg_coeff_parser,          holdsTokens([isNumberToken])),
+    (action_parser,             ['selectedHeuristic('] + time_tokens + [',', isWordToken, ')']),
+    (binary_operand_parser,     ['selectedHeurOperands('] + time_tokens + [',', 'operands('] + node_tokens + [','] + node_tokens + [')', ')']),
+    (unary_operand_parser,      ['selectedHeurOperands('] + time_tokens + [',', 'operands('] + node_tokens + [')', ')']),
+    (applicable_heur_parser,    ['applicableHeuristic('] + time_tokens + [',', isWordToken, ')']),
+    (factora_parser,            timeNumberTokens('factor1', 2)),
+    (factorb_parser,            timeNumberTokens('factor2', 2)),
+    (factorc_parser,            timeNumberTokens('factor3', 2)),
+    (factord_parser,            timeNumberTokens('factor4', 2)),
+    (refer_to_Parser,           ['referTo('] + time_tokens + [',', isNumberToken, ','] + node_tokens + [')']),
+    (soln_parser,               timeNumberTokens('solutionValue', 2)),
+    (substitute_parser,         timeNumberTokens('substitutedDegree', 1)),
+    ]
+
+def makeTokenCheck(element):
+    if callable(element):
+        return element
+    return lambda token: token == element
+
+class PredicateDispatcher(object):
+    """finds the grammar matching an atom by looking up its predicate name"""
+    def __init__(self, grammars):
+        super(PredicateDispatcher, self).__init__()
+        self.grammars = defaultdict(list) # 'name(' --> list of (parser, token checks), in order of grammars
+        for parser, layout in grammars:
+            self.grammars[layout[0]].append((parser, [makeTokenCheck(element) for element in layout]))
+
+    # @param parser_list only grammars in this list are tried
+    # @return (parser, tokens) like AnswerSetParser.findParserMatchingPredicate(), (None, []) if nothing matches
+    def parse(self, predicate, parser_list):
+        predicate   = predicate.lstrip()
+        candidates  = self.grammars.get(predicate[:predicate.find('(') + 1])
+        if not candidates:
+            return (None, [])
+        return self.matchTokens(candidates, PREDICATE_TOKEN_RE.findall(predicate), parser_list)
+
+    # same as parse(), for a clingo Symbol of a model solved in-process (see clingo_backend)
+    def parseSymbol(self, symbol, parser_list):
+        candidates  = self.grammars.get(symbol.name.replace('_', '') + '(') if symbol.arguments else None
+        if not candidates:
+            return (None, [])
+        return self.matchTokens(candidates, symbolToTokens(symbol), parser_list)
+
+    def matchTokens(self, candidates, tokens, parser_list):
+        for parser, checks in candidates:
+            # NOTE: like parseString(), only a prefix of the atom has to match
+            if any(parser is listed for listed in parser_list) and len(tokens) >= len(checks) \
+                    and all(check(token) for check, token in zip(checks, tokens)):
+                return (parser, tokens[:len(checks)])
+        return (None, [])
+
+PREDICATE_DISPATCHER = PredicateDispatcher(grammar_tokens)
+
+# @param symbol a clingo Symbol
+# @return the tokens PREDICATE_TOKEN_RE finds in the symbol's string (underscores removed),
+#       without printing the symbol and splitting the string again
+def symbolToTokens(symbol):
+    import clingo # NOTE: imported here, only in-process models are Symbols
+    tokens = []
+    appendSymbolTokens(symbol, clingo.SymbolType.Function, tokens)
+    return tokens
+
+def appendSymbolTokens(symbol, function_type, tokens):
+    if symbol.type != function_type: # numbers
+        tokens.append(str(symbol))
+    elif len(symbol.arguments) == 0:
+        tokens.append(str(symbol.name.replace('_', '')))
+    else:
+        tokens.append(str(symbol.name.replace('_', '')) + '(')
+        for index, arg in enumerate(symbol.arguments):
+            if index > 0:
+                tokens.append(',')
+            appendSymbolTokens(arg, function_type, tokens)
+        tokens.append(')')
+
+def parseWithGrammars(predicate, parser_list):
+    """ try every parser in turn (the slow way), return the first parser that succeeds and its tokens"""
+    for parser in parser_list:
+        try:
+            parse_output = parser.parseString(predicate)
+        except ParseException:
+            continue
+        return (parser, parse_output)
+    return (None, [])
+
 class GeneratedProblem(object):
     def __init__(self, eqn_params_dict):
         self.equation_parameters = dict(eqn_params_dict)
@@ -507,6 +615,11 @@ class ModelManager(object):
         pred_key = (pred_name, len(operands))
         self.model_predicates[pred_key].append(operands)
 
+    def addSymbol(self, symbol):
+        """add a clingo Symbol to model, operands are stored like addPredicate() stores them"""
+        operands = [''.join(symbolToTokens(arg)) for arg in symbol.arguments]
+        self.model_predicates[(symbol.name.replace('_', ''), len(operands))].append(operands)
+
     def unify(self, pred_key, partial_assign):
         if not self.model_predicates.has_key(pred_key):
             return []
@@ -559,16 +672,20 @@ class ModelManager(object):
         return (pred_name, operands)
         
 class AnswerSetParser(object):
-    def __init__(self, predicates):
+    # @param from_symbols predicates are clingo Symbols instead of strings (see clingo_backend)
+    def __init__(self, predicates, from_symbols=False):
         self.math_problems_dict = dict()
+        self.parse_fnc = PREDICATE_DISPATCHER.parseSymbol if from_symbols else PREDICATE_DISPATCHER.parse
+        self.from_symbols = from_symbols
         self.parseAnsSetFromPredicates(predicates)
     def parseAnsSetFromPredicates(self, predicates_list):
         """ compose as a string every solution in the predicate list given"""
         model_manager   = ModelManager()
         problem_parsers = defaultdict(lambda : MathProblemParser(model_manager))
+        add_to_model    = model_manager.addSymbol if self.from_symbols else model_manager.addPredicate
         for predicate in predicates_list:
             parser, tokens  = self.findParserMatchingPredicate(predicate)
-            model_manager.addPredicate(predicate)
+            add_to_model(predicate)
             if parser == binary_operand_parser:
                 time, remaining_tokens = peelHolds(tokens)
                 soln_num = time[1]
@@ -653,22 +770,10 @@ class AnswerSetParser(object):
         self.math_problems_dict = dict( [(prob_number, parser.jsonFriendlyFormat() ) for prob_number, parser in problem_parsers.items()])
     def findParserMatchingPredicate(self, predicate, parser_list=all_parsers):
         """ if any parser successfully parses the predicate, return tokens and the parser"""
-        for parser in parser_list:
-            try:
-                parse_output = parser.parseString(predicate)
-            except ParseException:
-                continue
-            return (parser, parse_output)
-        return (None, [])
+        return self.parse_fnc(predicate, parser_list)
     def parseForFactorPredicates(self, predicate):
         """ if any parser successfully parses the predicate, return tokens and the parser"""
-        for parser in factor_parsers:
-            try:
-                parse_output = parser.parseString(predicate)
-            except ParseException:
-                continue
-            return (parser, parse_output)
-        return (None, [])
+        return self.parse_fnc(predicate, factor_parsers)
     def getMathProblems(self):
         return self.math_problems_dict.values()
     def getGeneratedAnsSet(self):
@@ -680,6 +785,7 @@ class AnswerSetManager(json.JSONEncoder):
         # initialize MathProblemParser for each solution generated
         self.cmdline_args = cmdline_args
         self.answer_sets = []
+        self.solver_stats = None # solver_stats.SolverStatistics of the run that produced the answer sets
 
         json.JSONEncoder.__init__(self)
 
@@ -694,18 +800,24 @@ class AnswerSetManager(json.JSONEncoder):
 
     def initFromSTDIN(self):
         """load answer sets from stdin NOTE: expects JSON input via clingo --outf=2"""
-        all_answer_sets = self.__getJSONAnswerSetsFromSTDIN()
-        # parse the answer sets
-        for answer_set in all_answer_sets:
-            predicates = answer_set['Value']
-            ans_set= AnswerSetParser(predicates).getGeneratedAnsSet()
-            self.answer_sets.append(ans_set)
-
-    def __getJSONAnswerSetsFromSTDIN(self):
-        """ read json from stdin, remove underscores, load via json module and return answer sets """
-        clingo_output = ''.join(sys.stdin.xreadlines())
-        decoded_output = json.loads(clingo_output.replace('_', ''))
-        return decoded_output['Call'][0]['Witnesses'] # clingo provides lots of info, we just want answer sets
+        self.initFromClingoOutput(sys.stdin)
+
+    def initFromClingoOutput(self, file_obj):
+        """load answer sets from clingo json output, witnesses are read and parsed one at a time
+           returns the rest of clingo's output (Result, Models, Time and Stats)"""
+        reader = witness_reader.WitnessReader(file_obj)
+        for witness in reader.witnesses():
+            self.addAnswerSet(witness_reader.stripUnderscores(witness['Value']))
+        return reader.summary()
+
+    def addAnswerSet(self, predicates):
+        """parse a single answer set (list of predicate strings, underscores removed) and save it"""
+        ans_set= AnswerSetParser(predicates).getGeneratedAnsSet()
+        self.answer_sets.append(ans_set)
+
+    def addModelSymbols(self, symbols):
+        """parse a single answer set solved in-process (list of clingo Symbols, see clingo_backend) and save it"""
+        self.answer_sets.append(AnswerSetParser(symbols, from_symbols=True).getGeneratedAnsSet())
 
     def default(self, answer_set):
         """
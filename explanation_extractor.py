@@ -15,7 +15,7 @@ import re
 import tempfile
 import os       # for file deletion at the end 
 import parse_asp_rules as par
-from model_manager import ModelManager
+import join_planner
 from collections import defaultdict
 
 # 
@@ -141,6 +141,21 @@ def filterUnusedConditions(condition_list):
     pred_filter = lambda cond: isPredicate(cond) and not isSkippedPredicate(cond)
     return filter(pred_filter, condition_list)
 
+##
+# @param get_variables function returning the variables of a condition
+# @return list of (pred_key, variables) pairs for join_planner, or None if a condition
+#       isn't a predicate with variables only (left to the body order searches)
+def makeJoinConditions(conditions, get_variables):
+    join_conditions = []
+    for cond in conditions:
+        variables = get_variables(cond) if isPredicate(cond) else None
+        if not isinstance(variables, list) or not all([isinstance(var, str) for var in variables]):
+            return None
+        pred_key = ExplanationManager.makePredKey(cond)
+        # NOTE: model_manager removes leading '_' characters
+        join_conditions.append(((pred_key[0].replace('_', ''), pred_key[1]), tuple(variables)))
+    return join_conditions
+
 ##
 # manages a set of explanation objects and handles lookups
 # of those objects based on predicate key
@@ -217,6 +232,7 @@ class ExplanationTemplate(object):
         super(ExplanationTemplate, self).__init__()
         self.rule       = rule
         self.manager    = manager   # manager called to generate explanations of depth > 1
+        self.join_plans = None      # join_planner.ConditionPlans of the body, see unifyVars()
 
     def addAdditionalExplanation(self, rule):
         """Some predicates can be derived in more than one way"""
@@ -294,7 +310,13 @@ class ExplanationTemplate(object):
         predicates_only = filterUnusedConditions(self.rule.body)
         #for cond in predicates_only:
             #print cond.name
-        return ExplanationTemplate.unify(var_dictionary, predicates_only, model_manager)
+        # the planner matches selective conditions first, same result as unify()
+        if self.join_plans == None: # first use, False if the body can't be planned
+            join_conditions = makeJoinConditions(predicates_only, ExplanationTemplate.getPredicateVariables)
+            self.join_plans = join_conditions != None and join_planner.ConditionPlans(join_conditions)
+        if self.join_plans == False:
+            return ExplanationTemplate.unify(var_dictionary, predicates_only, model_manager)
+        return join_planner.findFirstUnifier(self.join_plans, var_dictionary, model_manager)
 
     def makeExplanation(self, var_values, model_manager=None, depth=1, factor_data = {}):
         """ return list of template sentences containing explanation"""
@@ -443,112 +465,72 @@ def isNotPredicate(condition):
     return not isPredicate(condition)
 
 ##
-# @return true if variable assignment can be used to make
-# a ground instance of cond that is in the mgr
-def condIsTrueUnderAssignment(cond, assign_dict, mgr):
-    # NOTE: None will be inserted if there is no assignment of a variable
-    var_assign = [assign_dict.get(variable) for variable in cond.args]
-    pred_key = ExplanationManager.makePredKey(cond)
-    for grounding in mgr.getAllGroundInstancesOf(pred_key):
-        if mgr.matches(grounding, var_assign):
-            return True
-    return False
-
-# TODO: combine with existing code
-# returns all predicates constituting level two explanation of pred_key
+# returns all predicates constituting level two explanation of pred_key: the bodies of the
+# rules deriving its level one conditions, joined as the conditions are used by pred_key's rule.
+# The head arguments of a level one rule are replaced by the arguments of its condition, and
+# the rule's other variables are renamed apart (two bodies may both use Deg for different values)
+# NOTE: constants in a level one head are assumed to match the condition's arguments
 def getLevelTwoPredicates(pred_key):
     template    = getTemplateManager().lookupTemplateFor(pred_key)
+    used_vars   = set(getTermVariables(template.rule))
 
-    # get template for each body predicate, then extract rules
-    body_templates = getBodyTemplateObjects(template)
-    body_rules = [b.rule for b in body_templates]
-    
-    # from the body rules, extract all conditions 
-    if len(body_rules) == 1:
-        level_two_preds = body_rules[0].body
-    else:
-        level_two_preds = reduce(lambda x,y: x.body + y.body, body_rules)
-
+    level_two_preds = []
+    for condition in filterUnusedConditions(template.rule.body):
+        if not template.manager.hasExplanationForPredicate(condition):
+            continue
+        body_rule = template.manager.lookupTemplateFor(ExplanationManager.makePredKey(condition)).rule
+        renaming = dict([(head_arg, arg) for head_arg, arg in zip(body_rule.head.args or [], condition.args or [])
+                            if isVariable(head_arg)])
+        for variable in getTermVariables(body_rule.body):
+            if variable not in renaming:
+                renaming[variable] = makeFreshVariable(variable, used_vars)
+                used_vars.add(renaming[variable])
+        level_two_preds += [renameVariables(cond, renaming) for cond in body_rule.body]
     return level_two_preds
 
-##
-# @return a list of assignments along with the one predicate that isn't satisfied
-def findAlmostMatchesPredicates(pred_key, model_mgr):
-    level_two_preds = getLevelTwoPredicates(pred_key) 
-    almost_fire     = []
-    for excluded, other_cond in makeListOfAlmostFireConditions(level_two_preds):
-        for assign in getAllSatisfyingAssignments(other_cond, model_mgr):
-            if condIsTrueUnderAssignment(excluded, assign, model_mgr):
-                continue
-            else:
-                almost_fire.append((excluded, assign))
-    return almost_fire
-
-##
-# for a given predicate key see find all instances of 'almost firing' and
-# return any associated explanations in a list
-def makeAlmostFireExplanations(pred_key, model_mgr):
-    rule_obj    = getTemplateManager().lookupTemplateFor(pred_key).rule
-    explanations = []
-    for excluded, assign in findAlmostMatchesPredicates(pred_key, model_mgr):
-        # rule head looks like : _applicable(T, _rule(HeurName, _operands(..)))
-        heur_name       = rule_obj.head.args[1].args[0] 
-        operand_vars    = rule_obj.head.args[1].args[1].args
-        sent = 'it looks like we can ' 
-        sent += heuristic_to_strategy[heur_name] + ' these terms'
-        operands = ExplanationTemplate.substituteVariableValues(operand_vars, assign)
-        explanations.append([sent, operands])
-
-        snd_sent = "but we cannot because this condition is untrue:" 
-        snd_sent += convertFromCamelCase(excluded.name) 
-        snd_oper = ExplanationTemplate.substituteVariableValues(excluded.args, assign)
-        explanations.append([snd_sent, snd_oper])
-
-    return explanations
+def isVariable(term):
+    return isinstance(term, str) and term[:1].isupper()
+
+# @param term a string, a list or a tuple from parse_asp_rules (Predicate, Comparison, ...)
+# @return list of the variables in term, in order of first use
+def getTermVariables(term):
+    if isVariable(term):
+        return [term]
+    variables = []
+    if isinstance(term, (list, tuple)):
+        for element in term:
+            variables += [var for var in getTermVariables(element) if var not in variables]
+    return variables
+
+# @return variable if it isn't in used_vars, otherwise variable with the first free suffix
+def makeFreshVariable(variable, used_vars):
+    fresh, suffix = variable, 1
+    while fresh in used_vars:
+        fresh, suffix = variable + '_' + str(suffix), suffix + 1
+    return fresh
+
+# @param renaming dictionary variable --> new variable or term
+# @return copy of term (see getTermVariables()) with its variables renamed
+def renameVariables(term, renaming):
+    if isVariable(term):
+        return renaming.get(term, term)
+    if isinstance(term, list):
+        return [renameVariables(element, renaming) for element in term]
+    if isinstance(term, tuple): # the namedtuples of parse_asp_rules
+        return type(term)(*[renameVariables(element, renaming) for element in term])
+    return term
 
 ##
-# return a hashmap of satisfying variable --> value mappings
-# for the condition list, based on predicates in model_mgr
-def getAllSatisfyingAssignments(conditions, model_mgr):
-    all_assignments = []
-    findAssign(conditions, model_mgr, {}, all_assignments)
-    return all_assignments
-
-##
-# find a all assignments that satisfy condition list recursively
-def findAssign(cond_list, mgr, assign, all_assign):
-    if cond_list == []:
-        if assign != {}: # make sure we actually found a satisfying assignment
-            all_assign.append(assign)
-        return
-    for match in getAllCompatibleMatches(cond_list[0], mgr, assign):
-        new_assign =    dict(assign)
-        match_dict =    dict(zip(cond_list[0].args, match))
-        new_assign.update(match_dict)
-        findAssign(cond_list[1:], mgr, new_assign, all_assign)
-
-##
-# generator function that yields every grounding of a condition 
-# that is compatible with existing variable assignments 
-def getAllCompatibleMatches(cond, mgr, assign):
-    pred_key = ExplanationManager.makePredKey(cond)
-    # NOTE: lazy bug fix, some modules expect predicates without '_'; model_manager does
-    pred_key = (pred_key[0].replace('_',''), pred_key[1])
-    for ground_pred in mgr.getAllGroundInstancesOf(pred_key):
-        # convert grounding to variable_name --> value mapping
-        ground_dict = dict(zip(cond.args, ground_pred))
-        if isCompatibleWith(ground_dict, assign):
-            yield ground_pred
-
-##
-# @return true if there are no assignment conflicts
-# between variables in both dictionaries
-def isCompatibleWith(ground_dict, assign_dict):
-    for common_key in set(ground_dict.keys()).intersection( set(assign_dict.keys())):
-        if ground_dict[common_key] != assign_dict[common_key]:
-            return False
-    return True
-
+# for the _almostApplicable atoms of almost_fire.lp (see make_almost_fire_rules.py)
+# @param operands values of the heuristic's operands, None if unknown
+# @param missing_values values of the arguments of the missing condition
+# @return the two explanation sentences of a heuristic that almost fires
+def makeAlmostFireSentences(heur_name, operands, missing_name, missing_values):
+    sent = 'it looks like we can ' 
+    sent += heuristic_to_strategy[heur_name] + ' these terms'
+    snd_sent = "but we cannot because this condition is untrue: " 
+    snd_sent += convertFromCamelCase(missing_name.lstrip('_'))
+    return [[sent, list(operands)], [snd_sent, list(missing_values)]]
 
 ##
 # Given a template object 
@@ -578,19 +560,8 @@ def makeListOfAlmostFireConditions(list_of_conditions):
         yield (excluded_cond, other_cond)
 
 
-# TODO: test code delete later        
-def getTestModelMgr():
-    mgr = ModelManager()
-    mgr.addPredicate('_areBeingMultiplied(_time(0,1), _id(2,1), _id(2,2))')
-    mgr.addPredicate('__isLessThan(_id(2,1), _id(2,2))')
-    #mgr.addPredicate('_isSumOfTerms(_time(0,1), _id(2,1))')
-
-    return mgr
-
 def main(files):
     parseFiles(files)
-    # TODO: delete this, for testing purposes only
-    print makeAlmostFireExplanations(('weCanSimplifyByDistributingTheSingleFactor', 3), getTestModelMgr())
 if __name__ == '__main__':
     files_to_parse = ['rules.lp']
     #files_to_parse = ['rules.lp', 'eqn_generator.lp', 'nodes.lp', 'polynomial.lp', 'heuristics.lp']
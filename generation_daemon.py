@@ -0,0 +1,255 @@
+#!/usr/bin/env python
+#
+# Author:   Armando Diaz Tolentino <ajdt@cs.washington.edu>
+#
+# Desc:     Long running problem generation service. Grounded clingo controls
+#           (one per set of constants), the explanation templates parsed from
+#           rules.lp and the visualizer imports are kept in memory, so a request
+#           only pays for solving and parsing its answer sets.
+#           Requests and responses are one json object per line, over a unix or
+#           TCP socket. A request looks like
+#               {"heurSeq": "combineSameTerms", "maxSteps": 1, "numSets": 1, "seed": 3, "timeout": 10,
+#                "features": [["rule", "feature", "value"]]}
+#           (every field is optional) and the response is the totally_new_visualizer
+#           json output, or {"error": message} if the request failed. The timeout
+#           (seconds) covers the time a request waits for a worker and solving, a
+#           request that would have to ground a solver after its deadline fails.
+#           Only the maxSteps values grounded with --preload are served, unless
+#           --anyConstants lets requests set maxSteps and other constants freely.
+#           Feature triples are sent inline, featuresFile (a path on the server) is refused.
+#           Start with:  python generation_daemon.py --unix generation.sock
+#           Query with:  python generation_daemon.py --unix generation.sock --request '{"maxSteps": 1}'
+#
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import threading
+import SocketServer
+import clingo_backend
+from demo_runner import DemoQuerySolver
+import explanation_extractor as explain
+import totally_new_visualizer
+
+DEFAULT_PORT        = 9431
+DEFAULT_MAX_STEPS   = 1 # same as config_params.lp
+
+# @param request decoded json request
+# @return hashable key for the constants a request is grounded with
+def getConfigKey(request):
+    constants = dict(request.get('constants', {}))
+    constants['maxSteps'] = request.get('maxSteps', DEFAULT_MAX_STEPS)
+    return tuple(sorted((str(name), str(value)) for name, value in constants.items()))
+
+# @return clingo options for the constants in config_key
+def getConstantArgs(config_key):
+    const_args = []
+    for name, value in config_key:
+        const_args += ['-c', name + '=' + value]
+    return const_args
+
+class GenerationService(object):
+    """answers generation requests, at most num_workers at a time, using a pool of grounded solvers"""
+    # @param any_constants if False, only the configurations grounded by warmUp() are served
+    def __init__(self, lp_file='eqn_generator.lp', num_workers=2, max_queue=32, max_idle_solvers=4, timeout=30.0,
+                    any_constants=False):
+        super(GenerationService, self).__init__()
+        self.lp_file            = lp_file
+        self.max_queue          = max_queue
+        self.max_idle_solvers   = max_idle_solvers
+        self.timeout            = timeout
+        self.any_constants      = any_constants
+        self.served_configs     = set() # config keys grounded by warmUp()
+        self.lock               = threading.Lock()
+        self.worker_freed       = threading.Condition(self.lock)
+        self.num_free_workers   = num_workers
+        self.num_queued         = 0
+        self.idle_solvers       = [] # list of (config_key, solver), least recently used first
+
+    def warmUp(self, max_steps_list=[]):
+        """parse rules.lp for explanations and ground a solver for each value of maxSteps"""
+        explain.getTemplateManager()
+        for max_steps in max_steps_list:
+            config_key = getConfigKey({'maxSteps': max_steps})
+            self.served_configs.add(config_key)
+            self.releaseSolver(config_key, self.acquireSolver(config_key))
+
+    # @param deadline grounding a new solver isn't started after it, None never gives up
+    def acquireSolver(self, config_key, deadline=None):
+        with self.lock:
+            for index, (key, solver) in enumerate(self.idle_solvers):
+                if key == config_key:
+                    del self.idle_solvers[index]
+                    return solver
+        # NOTE: grounding can't be cancelled, so it's only started with time left
+        if deadline is not None and time.time() >= deadline:
+            raise clingo_backend.SolveTimeout('no time left to ground a solver for ' + str(dict(config_key)))
+        # no idle solver for these constants, grounding happens outside the lock
+        return DemoQuerySolver(self.lp_file, getConstantArgs(config_key))
+
+    def releaseSolver(self, config_key, solver):
+        with self.lock:
+            self.idle_solvers.append((config_key, solver))
+            if len(self.idle_solvers) > self.max_idle_solvers:
+                del self.idle_solvers[0]
+
+    # wait for a free worker, the queued request gives up at deadline
+    # NOTE: Semaphore.acquire() has no timeout in python 2, so waiting uses a Condition
+    # @return True if the request got a worker
+    def acquireWorker(self, deadline):
+        with self.worker_freed:
+            while self.num_free_workers == 0 and time.time() < deadline:
+                self.worker_freed.wait(deadline - time.time())
+            self.num_queued -= 1
+            if self.num_free_workers == 0:
+                return False
+            self.num_free_workers -= 1
+            return True
+
+    def releaseWorker(self):
+        with self.worker_freed:
+            self.num_free_workers += 1
+            self.worker_freed.notify()
+
+    # @return error message for a request the service doesn't answer, None if it's accepted
+    def checkRequest(self, request):
+        if 'featuresFile' in request:
+            return 'featuresFile is not accepted, send the triples as features'
+        features = request.get('features', [])
+        if not isinstance(features, list) or not all([isinstance(triple, list) and len(triple) == 3 for triple in features]):
+            return 'features must be a list of [rule, feature, value] triples'
+        try:
+            config_key = getConfigKey(request)
+        except (TypeError, ValueError):
+            return 'constants must be an object of constant name --> value'
+        if not self.any_constants and config_key not in self.served_configs:
+            return 'only the preloaded configurations are served: ' + \
+                    ', '.join([str(dict(config_key)) for config_key in sorted(self.served_configs)])
+        return None
+
+    # @return response dictionary for the request
+    def handleRequest(self, request):
+        try:
+            timeout = float(request.get('timeout', self.timeout))
+        except (TypeError, ValueError):
+            return {'error': 'timeout must be a number of seconds'}
+        error = self.checkRequest(request)
+        if error:
+            return {'error': error}
+        # the timeout covers the time spent waiting for a worker
+        deadline = time.time() + timeout
+        with self.lock:
+            if self.num_queued >= self.max_queue:
+                return {'error': 'too many queued requests'}
+            self.num_queued += 1
+        if not self.acquireWorker(deadline):
+            return {'error': 'timeout: no worker was free within %gs' % timeout}
+        try:
+            return self.solveRequest(request, deadline)
+        except clingo_backend.SolveTimeout as err:
+            return {'error': 'timeout: ' + str(err)}
+        except ValueError as err: # e.g. assumptions on unknown atoms, see DemoQuerySolver.getAssumptions()
+            return {'error': str(err)}
+        except Exception as err: # bad requests shouldn't take down the service
+            return {'error': repr(err)}
+        finally:
+            self.releaseWorker()
+
+    # @param deadline time the request has to be answered by
+    def solveRequest(self, request, deadline):
+        config_key  = getConfigKey(request)
+        solver      = self.acquireSolver(config_key, deadline)
+        manager     = totally_new_visualizer.AnswerSetManager({'json_output': 'true'})
+        features    = [[str(element) for element in triple] for triple in request.get('features', [])]
+        try:
+            solver.solveRequest(request.get('heurSeq', ''), 'None', request.get('numSets', 1), manager,
+                    request.get('seed'), max(deadline - time.time(), 0.0), features)
+        finally:
+            self.releaseSolver(config_key, solver) # a cancelled solver can still be reused
+        return manager.answer_sets_dict
+
+class GenerationRequestHandler(SocketServer.StreamRequestHandler):
+    """reads one json request per line and writes one json response per line"""
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line)
+            except ValueError:
+                response = {'error': 'request is not valid json'}
+            else:
+                response = self.server.service.handleRequest(request)
+            self.wfile.write(json.JSONEncoder().encode(response) + '\n')
+            self.wfile.flush()
+
+class UnixGenerationServer(SocketServer.ThreadingMixIn, SocketServer.UnixStreamServer):
+    daemon_threads = True
+
+class TCPGenerationServer(SocketServer.ThreadingMixIn, SocketServer.TCPServer):
+    daemon_threads      = True
+    allow_reuse_address = True
+
+def makeServer(service, unix_socket=None, host='localhost', port=DEFAULT_PORT):
+    if unix_socket:
+        if os.path.exists(unix_socket): # left over from a previous run
+            os.remove(unix_socket)
+        server = UnixGenerationServer(unix_socket, GenerationRequestHandler)
+    else:
+        server = TCPGenerationServer((host, port), GenerationRequestHandler)
+    server.service = service
+    return server
+
+# @param request dictionary, see the description at the top of this file
+# @return the decoded response
+def sendRequest(request, unix_socket=None, host='localhost', port=DEFAULT_PORT):
+    if unix_socket:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(unix_socket)
+    else:
+        sock = socket.create_connection((host, port))
+    sock_file = sock.makefile('rw')
+    sock_file.write(json.dumps(request) + '\n')
+    sock_file.flush()
+    response = json.loads(sock_file.readline())
+    sock_file.close()
+    sock.close()
+    return response
+
+def main(args):
+    if args.request:
+        start = time.time()
+        response = sendRequest(json.loads(args.request), args.unix, args.host, args.port)
+        print json.JSONEncoder().encode(response)
+        sys.stderr.write('%.3fs\n' % (time.time() - start))
+        return
+    service = GenerationService(args.lp_file, args.workers, args.maxQueue, args.maxIdleSolvers, args.timeout,
+                    args.anyConstants)
+    service.warmUp([int(steps) for steps in args.preload.split(',') if steps])
+    server = makeServer(service, args.unix, args.host, args.port)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        if args.unix and os.path.exists(args.unix):
+            os.remove(args.unix)
+
+def getCmdLineArgs():
+    cmd_parser = argparse.ArgumentParser(description='problem generation daemon')
+    cmd_parser.add_argument('--unix', default=None, required=False) # unix socket path, TCP is used if not given
+    cmd_parser.add_argument('--host', default='localhost', required=False)
+    cmd_parser.add_argument('--port', type=int, default=DEFAULT_PORT, required=False)
+    cmd_parser.add_argument('--lp_file', default='eqn_generator.lp', required=False)
+    cmd_parser.add_argument('--workers', type=int, default=2, required=False) # requests solved at the same time
+    cmd_parser.add_argument('--maxQueue', type=int, default=32, required=False) # requests waiting for a worker
+    cmd_parser.add_argument('--maxIdleSolvers', type=int, default=4, required=False) # grounded controls kept around
+    cmd_parser.add_argument('--timeout', type=float, default=30.0, required=False) # default seconds per request
+    cmd_parser.add_argument('--preload', default=str(DEFAULT_MAX_STEPS), required=False) # comma separated maxSteps values to ground at startup
+    cmd_parser.add_argument('--anyConstants', action='store_true') # serve any maxSteps and constants, not just the preloaded ones
+    cmd_parser.add_argument('--request', default=None, required=False) # send this json request to a running daemon
+    return cmd_parser.parse_args()
+
+if __name__ == "__main__":
+    main(getCmdLineArgs())
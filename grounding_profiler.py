@@ -0,0 +1,184 @@
+#!/usr/bin/env python
+#
+# Author:   Armando Diaz Tolentino <ajdt@cs.washington.edu>
+#
+# Desc:     Grounding profiler (replaces the old 'cut | sort | uniq -c' prof target).
+#           Grounds the program once per configuration and reports
+#               1. ground atoms and ground rules per predicate name/arity
+#                  (rules are attributed to the predicate in their head)
+#               2. ground instances of every rule body, per source file and line.
+#                  Each rule gets a copy '__profileRule(N, (Vars)) :- Body.' where
+#                  Vars are the rule's global variables, so the atoms of
+#                  __profileRule(N, _) are exactly the body instantiations gringo made
+#           With --scale, the profile is repeated for each value of a constant
+#           (e.g. --scale maxSteps=1,2,3) to show how the counts grow.
+#           Output is a ranked table, and optionally json (--json).
+#
+import re
+import json
+import time
+import argparse
+from collections import defaultdict
+import clingo
+import asp_source
+
+PROFILE_PREDICATE   = '__profileRule'
+# aggregate elements and conditions have local variables, they are skipped
+BRACES_REGEX        = re.compile(r'\{[^{}]*\}')
+
+# @return set of variables of a rule body that are bound outside aggregates
+def globalVariablesIn(body):
+    return asp_source.variablesIn(BRACES_REGEX.sub('', body))
+
+# @param statements list of asp_source.Statement
+# @return pair (instrumentation_code, list of statements that were instrumented)
+def makeProfileRules(statements):
+    profile_rules, profiled = [], []
+    for stmt in statements:
+        if asp_source.isDirective(stmt.text) or ':~' in stmt.text:
+            continue
+        head, body = asp_source.splitRule(stmt.text)
+        if not body: # facts are counted by their atoms
+            continue
+        variables = sorted(globalVariablesIn(body))
+        if len(variables) == 1:
+            variables.append('') # (X,) is a tuple, (X) isn't
+        index = len(profiled)
+        profile_rules.append('%s(%d, (%s)) :- %s.' % (PROFILE_PREDICATE, index, ','.join(variables), body))
+        profiled.append(stmt)
+    return '\n'.join(profile_rules), profiled
+
+class GroundRuleObserver(object):
+    """counts the ground rules passed to the solver, by head atom"""
+    def __init__(self):
+        super(GroundRuleObserver, self).__init__()
+        self.rules_by_head  = defaultdict(int) # atom id --> number of rules with the atom in their head
+        self.num_rules      = 0
+        self.num_constraints = 0
+
+    def addRule(self, head):
+        self.num_rules += 1
+        if not head:
+            self.num_constraints += 1
+        for atom in head:
+            self.rules_by_head[atom] += 1
+
+    def rule(self, choice, head, body):
+        self.addRule(head)
+
+    def weight_rule(self, choice, head, lower_bound, body):
+        self.addRule(head)
+
+# @return dictionary with the profile of one grounding
+def profileGrounding(lp_file='eqn_generator.lp', const_args=[]):
+    statements = asp_source.readStatements(lp_file)
+    profile_code, profiled = makeProfileRules(statements)
+
+    control = clingo.Control(list(const_args) + ['--warn=none'])
+    observer = GroundRuleObserver()
+    control.register_observer(observer)
+    control.load(lp_file)
+    control.add('base', [], profile_code)
+    start = time.time()
+    control.ground([('base', [])])
+    ground_time = time.time() - start
+
+    atoms, rules = defaultdict(int), defaultdict(int)
+    instances = defaultdict(int)
+    for sym_atom in control.symbolic_atoms:
+        symbol = sym_atom.symbol
+        if symbol.name == PROFILE_PREDICATE:
+            instances[symbol.arguments[0].number] += 1
+            continue
+        key = symbol.name + '/' + str(len(symbol.arguments))
+        atoms[key] += 1
+        rules[key] += observer.rules_by_head.get(sym_atom.literal, 0)
+
+    rule_profile = []
+    for index, stmt in enumerate(profiled):
+        rule_profile.append({'file': stmt.file_name, 'line': stmt.line, 'rule': ' '.join(stmt.text.split()),
+                'instances': instances[index]})
+    return {'constants': list(const_args), 'ground_time': ground_time,
+            'total_rules': observer.num_rules, 'total_constraints': observer.num_constraints,
+            'total_atoms': sum(atoms.values()),
+            'predicates': dict([(key, {'atoms': atoms[key], 'rules': rules[key]}) for key in atoms]),
+            'rules': rule_profile}
+
+# @return total body instances for every source file in a profile
+def getFileTotals(profile):
+    totals = defaultdict(int)
+    for rule in profile['rules']:
+        totals[rule['file']] += rule['instances']
+    return totals
+
+def printProfile(profile, top):
+    print('ground time %.2fs, %d ground rules (%d constraints), %d atoms' % (profile['ground_time'],
+            profile['total_rules'], profile['total_constraints'], profile['total_atoms']))
+    print('')
+    print('%-45s %12s %12s' % ('predicate', 'ground rules', 'atoms'))
+    ranked = sorted(profile['predicates'].items(), key=lambda item: (item[1]['rules'], item[1]['atoms']), reverse=True)
+    for key, counts in ranked[:top]:
+        print('%-45s %12d %12d' % (key, counts['rules'], counts['atoms']))
+    print('')
+    print('%-25s %14s' % ('file', 'body instances'))
+    for file_name, total in sorted(getFileTotals(profile).items(), key=lambda item: item[1], reverse=True):
+        print('%-25s %14d' % (file_name, total))
+    print('')
+    print('%14s  %-25s %s' % ('body instances', 'location', 'rule'))
+    for rule in sorted(profile['rules'], key=lambda rule: rule['instances'], reverse=True)[:top]:
+        location = '%s:%d' % (rule['file'], rule['line'])
+        print('%14d  %-25s %s' % (rule['instances'], location, rule['rule'][:80]))
+
+# @param profiles list of (value, profile) pairs, one for each value of the scaled constant
+def printScaling(const_name, profiles, top):
+    values = [value for value, profile in profiles]
+    print('scaling of %s over %s' % (const_name, ', '.join(values)))
+    header = ''.join(['%14s' % (const_name + '=' + value) for value in values])
+    print('%-45s %s' % ('total ground rules', ''.join(['%14d' % profile['total_rules'] for value, profile in profiles])))
+    print('%-45s %s' % ('ground time (s)', ''.join(['%14.2f' % profile['ground_time'] for value, profile in profiles])))
+    print('')
+    # rank by the counts of the largest configuration
+    last_profile = profiles[-1][1]
+    print('%-45s %s' % ('predicate (ground rules)', header))
+    ranked = sorted(last_profile['predicates'].keys(), key=lambda key: last_profile['predicates'][key]['rules'], reverse=True)
+    for key in ranked[:top]:
+        counts = [profile['predicates'].get(key, {'rules': 0})['rules'] for value, profile in profiles]
+        print('%-45s %s' % (key, ''.join(['%14d' % count for count in counts])))
+    print('')
+    print('%-45s %s' % ('rule (body instances)', header))
+    ranked = sorted(range(len(last_profile['rules'])), key=lambda index: last_profile['rules'][index]['instances'], reverse=True)
+    for index in ranked[:top]:
+        rule = last_profile['rules'][index]
+        counts = [profile['rules'][index]['instances'] for value, profile in profiles]
+        print('%-45s %s' % ('%s:%d' % (rule['file'], rule['line']), ''.join(['%14d' % count for count in counts])))
+    print('')
+
+def main(args):
+    const_args = []
+    for const in args.const:
+        const_args += ['-c', const]
+    results = {'base': profileGrounding(args.lp_file, const_args)}
+    printProfile(results['base'], args.top)
+    print('')
+    for scale in args.scale:
+        const_name, values = scale.split('=')
+        profiles = [(value, profileGrounding(args.lp_file, const_args + ['-c', const_name + '=' + value]))
+                for value in values.split(',')]
+        printScaling(const_name, profiles, args.top)
+        results[const_name] = dict(profiles)
+    if args.json:
+        json_file = open(args.json, 'w')
+        json.dump(results, json_file, indent=1)
+        json_file.close()
+
+def getCmdLineArgs():
+    cmd_parser = argparse.ArgumentParser(description='attribute ground rules and atoms to predicates and source rules')
+    cmd_parser.add_argument('--lp_file', default='eqn_generator.lp', required=False)
+    cmd_parser.add_argument('--const', action='append', default=[]) # e.g. --const maxSteps=2
+    cmd_parser.add_argument('--scale', action='append', default=[]) # e.g. --scale maxDepth=2,3,4
+    cmd_parser.add_argument('--top', type=int, default=25, required=False) # number of rows in each table
+    cmd_parser.add_argument('--json', default=None, required=False) # file name for json output
+    return cmd_parser.parse_args()
+
+if __name__ == "__main__":
+    main(getCmdLineArgs())
@@ -0,0 +1,179 @@
+#!/usr/bin/env python
+#
+# Author:   Armando Diaz Tolentino <ajdt@cs.washington.edu>
+#
+# Desc:     Multi-shot version of the problem generator. The time-0 problem
+#           generation and all time-independent rules are grounded once,
+#           every additional time step is grounded on the same clingo.Control
+#           object (so learned state is kept), and the external _query(t)
+#           selects which step is the stop time.
+#           Rules with a time variable are moved into the step(t) program part
+#           automatically, only the definition of time in eqn_solver.lp is
+#           replaced (by eqn_solver_incremental.lp)
+#
+import os
+import re
+import clingo
+import asp_source
+import clingo_backend
+
+INCREMENTAL_SOLVER_FILE = 'eqn_solver_incremental.lp'
+TIME_VARIABLE           = 'Time'
+START_TIME_VARIABLE     = 'StartTime'
+TIME_VARIABLE_SUFFIXES  = ('Time', 'Tick') # naming convention of variables holding a _time(..)
+SHOW_SIGNATURE_REGEX    = re.compile(r'^#show\s+(_{0,2}[a-z][A-Za-z0-9_]*)\s*/\s*(\d+)\s*\.$')
+
+# @return statement text with the given literals appended to its body
+def addBodyLiterals(statement_text, literals):
+    text = statement_text.strip()[:-1] # remove period
+    if ':-' in text:
+        return text + ',\n\t\t' + ', '.join(literals) + '.'
+    return text + '\n\t\t:-\t' + ', '.join(literals) + '.'
+
+# @return position one past the end of the predicate starting at start_idx
+def endOfPredicate(text, start_idx):
+    paren_idx = text.find('(', start_idx)
+    name_end = start_idx
+    while name_end < len(text) and (text[name_end].isalnum() or text[name_end] == '_'):
+        name_end += 1
+    if paren_idx == -1 or text[name_end:paren_idx].strip() != '':
+        return name_end
+    depth = 0
+    for idx in range(paren_idx, len(text)):
+        if text[idx] == '(':
+            depth += 1
+        elif text[idx] == ')':
+            depth -= 1
+            if depth == 0:
+                return idx + 1
+    return len(text)
+
+# wraps every atom of the predicates in pred_keys as __atStep(t, Atom)
+def wrapStepAtoms(statement_text, pred_keys):
+    matches = []
+    for match in asp_source.PREDICATE_REGEX.finditer(statement_text):
+        end_idx = endOfPredicate(statement_text, match.start())
+        arity = asp_source.countArguments(statement_text, match.end()-1) if match.group(2) else 0
+        if (match.group(1), arity) in pred_keys:
+            matches.append((match.start(), end_idx))
+    for start_idx, end_idx in reversed(matches):
+        atom = statement_text[start_idx:end_idx]
+        statement_text = statement_text[:start_idx] + '__atStep(t, ' + atom + ')' + statement_text[end_idx:]
+    return statement_text
+
+def isTimeDependent(statement_text):
+    return TIME_VARIABLE in asp_source.variablesIn(statement_text)
+
+# @return list of the time variables of a statement, in order of first use
+def timeVariablesIn(statement_text):
+    time_vars = []
+    for var in asp_source.VARIABLE_REGEX.findall(statement_text):
+        if var.endswith(TIME_VARIABLE_SUFFIXES) and var not in time_vars:
+            time_vars.append(var)
+    return time_vars
+
+# Rules joining several times are grounded in the step of their latest time.
+# @return one list of body literals per copy of the rule: the i-th time variable
+#       is a time of step t, the ones before it are earlier and the ones after it
+#       are not later, so every ground instance is made once
+def makeStepBindings(time_vars):
+    bindings = []
+    for idx, var in enumerate(time_vars):
+        bindings.append(['__timeBefore(%s, t)' % before for before in time_vars[:idx]]
+                + ['__timeAt(%s, t)' % var]
+                + ['__timeUpTo(%s, t)' % after for after in time_vars[idx+1:]])
+    return bindings
+
+# @param file_name .lp file with the program parts replacing the definition of time
+# @return set of (name, arity) keys of the predicates it defines
+def findReplacedPredicates(file_name):
+    replaced = set()
+    for stmt in asp_source.readStatements(file_name):
+        if not asp_source.isDirective(stmt.text):
+            replaced.update(asp_source.headPredicateKeys(stmt.text))
+    return replaced
+
+# @return set of (name, arity) keys of time-free atoms derived from time dependent rules.
+#       These would be redefined by every step, so they get wrapped with __atStep(t, ..)
+def findStepAtoms(statements):
+    step_atoms = set()
+    for stmt in statements:
+        head, body = asp_source.splitRule(stmt.text)
+        if not head or not timeVariablesIn(stmt.text):
+            continue
+        if not timeVariablesIn(head):
+            step_atoms.update(asp_source.outermostPredicateKeys(head))
+    return step_atoms
+
+# The step atoms of a '#show name/arity.' directive are shown through __atQuery(t, Atom),
+# which only holds for the queried step. Conditions of earlier steps would make
+# projection (--project) tell apart models that differ in the step an atom holds at.
+# @return list of statements for the step(t) program part
+def showStepAtoms(pred_key):
+    args = ['Arg%d' % num for num in range(pred_key[1])]
+    atom = pred_key[0] + ('(' + ', '.join(args) + ')' if args else '')
+    return ['__atQuery(t, %s)\n\t\t:-\t__atStep(Step, %s),\n\t\t\tStep <= t, _query(t).' % (atom, atom),
+            '#show %s : __atQuery(t, %s).' % (atom, atom)]
+
+# @param statements list of asp_source.Statement
+# @param replaced_keys predicates defined by INCREMENTAL_SOLVER_FILE, their rules are skipped
+# @return pair (base_code, step_code)
+def splitProgram(statements, replaced_keys=set()):
+    statements = [stmt for stmt in statements if asp_source.isDirective(stmt.text)
+            or not set(asp_source.headPredicateKeys(stmt.text)) & replaced_keys]
+    step_atoms = findStepAtoms(statements)
+    base_code, step_code = [], []
+    for stmt in statements:
+        text = stmt.text
+        uses_step_atoms = bool(set(asp_source.predicateKeysIn(text)) & step_atoms)
+        if asp_source.isDirective(text):
+            show_match = SHOW_SIGNATURE_REGEX.match(text)
+            if text.startswith('#show') and isTimeDependent(text): # conditional #show of time dependent atoms
+                step_code.append(text[:-1] + ', __timeAt(Time, t).')
+            elif show_match and (show_match.group(1), int(show_match.group(2))) in step_atoms:
+                step_code += showStepAtoms((show_match.group(1), int(show_match.group(2))))
+            else:
+                base_code.append(text)
+            continue
+        if uses_step_atoms:
+            text = wrapStepAtoms(text, step_atoms)
+        time_vars = timeVariablesIn(text)
+        if time_vars == [START_TIME_VARIABLE]:
+            step_code.append(addBodyLiterals(text, ['__timeAt(StartTime, t)', 't == 0']))
+        elif time_vars:
+            step_code += [addBodyLiterals(text, literals) for literals in makeStepBindings(time_vars)]
+        elif uses_step_atoms:
+            step_code.append(text)
+        else:
+            base_code.append(text)
+    return '\n'.join(base_code), '\n'.join(step_code)
+
+class IncrementalSolver(object):
+    """grounds the problem generator one time step at a time on a single clingo.Control object"""
+    def __init__(self, lp_file='eqn_generator.lp', control_args=[]):
+        super(IncrementalSolver, self).__init__()
+        solver_file = os.path.join(os.path.dirname(lp_file), INCREMENTAL_SOLVER_FILE)
+        self.solver = clingo_backend.InProcessSolver([solver_file], control_args)
+        base_code, step_code = splitProgram(asp_source.readStatements(lp_file), findReplacedPredicates(solver_file))
+        self.solver.add(base_code)
+        self.solver.add(step_code, 'step', ['t'])
+        self.grounded_steps = -1 # no steps grounded yet
+        self.query_step     = None
+
+    def groundUpTo(self, num_steps):
+        while self.grounded_steps < num_steps:
+            self.grounded_steps += 1
+            parts = [('step', [clingo.Number(self.grounded_steps)])]
+            if self.grounded_steps == 0:
+                parts.insert(0, ('base', []))
+            self.solver.ground(parts)
+
+    # @param num_steps the number of steps every solution must use (same as maxSteps)
+    # @param on_model called with the shown clingo Symbols of each model
+    def solveForSteps(self, num_steps, on_model):
+        self.groundUpTo(num_steps)
+        if self.query_step is not None:
+            self.solver.assignExternal(clingo.Function('_query', [clingo.Number(self.query_step)]), False)
+        self.solver.assignExternal(clingo.Function('_query', [clingo.Number(num_steps)]), True)
+        self.query_step = num_steps
+        return self.solver.solve(on_model)
@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+#
+# Author:   Armando Diaz Tolentino <ajdt@cs.washington.edu>
+#
+# Desc:     Plans the joins explanation_extractor does to unify rule body conditions
+#           with the atoms of a model (ModelManager or ModelView). Instead of matching
+#           conditions in rule body order, the condition with the most bound variables
+#           is matched next, ties go to the one with the fewest atoms in the model.
+#           findFirstUnifier() gives the same result as ExplanationTemplate.unify()
+#           in body order.
+#           A condition is a (pred_key, variables) pair, pred_key as stored by ModelManager,
+#           the plans for a list of conditions are kept by a ConditionPlans instance.
+#
+from collections import namedtuple
+
+# a condition that is matched: its index in the body, and (variable, positions) pairs
+# for the positions whose value has to be the variable's value
+PlanStep = namedtuple('PlanStep', ['index', 'pred_key', 'variables', 'var_positions'])
+
+##
+# the plans of one list of conditions, one for every set of assigned variables
+class ConditionPlans(object):
+    def __init__(self, conditions):
+        super(ConditionPlans, self).__init__()
+        self.conditions = list(conditions)
+        self.plans      = {} # (known variables, assigned variables) --> JoinPlan
+
+    # @return cached JoinPlan for the variables of assignment
+    def getPlan(self, assignment):
+        valued_vars = frozenset([var for var, value in assignment.items() if value != None])
+        plan_key    = (frozenset(assignment.keys()), valued_vars)
+        if plan_key not in self.plans:
+            self.plans[plan_key] = JoinPlan(self.conditions, assignment.keys(), valued_vars)
+        return self.plans[plan_key]
+
+# @param plans ConditionPlans of the conditions
+# @param assignment dictionary variable --> value
+# @return the assignment ExplanationTemplate.unify() would return, None if there is none
+def findFirstUnifier(plans, assignment, model_mgr):
+    plan = plans.getPlan(assignment)
+    if len(plan.steps) == 0:
+        return assignment
+    order = plan.orderSteps(model_mgr)
+    in_body_order = order == plan.body_order
+    # in body order the first solution found is the first unifier
+    solutions = plan.search(order, model_mgr, assignment, in_body_order)
+    if len(solutions) == 0:
+        return None
+    if not in_body_order:
+        solutions.sort(key=plan.getSortKey(model_mgr))
+    return plan.makeAssignment(solutions[0], assignment)
+
+##
+# the conditions that are matched and the positions that bind or check each
+# variable. These only depend on which variables are assigned, so they're worked
+# out once; the order the steps are matched in depends on the model.
+class JoinPlan(object):
+    def __init__(self, conditions, known_vars, valued_vars):
+        super(JoinPlan, self).__init__()
+        self.valued_vars = valued_vars
+        self.steps = []
+        known, valued = set(known_vars), set(valued_vars)
+        for index, (pred_key, variables) in enumerate(conditions):
+            if all([var in known for var in variables]):
+                continue # ExplanationTemplate.unify() doesn't check these
+            last_position = dict([(var, pos) for pos, var in enumerate(variables)])
+            var_positions = []
+            for var in sorted(last_position.keys(), key=last_position.get):
+                if var in valued:
+                    positions = [pos for pos, other in enumerate(variables) if other == var]
+                else:
+                    positions = [last_position[var]]
+                var_positions.append((var, positions))
+            self.steps.append(PlanStep(index, pred_key, variables, var_positions))
+            known.update(variables)
+            valued.update(variables)
+        self.body_order = range(len(self.steps))
+
+    ##
+    # greedy order: most bound variables first, then fewest atoms, then body order
+    # @return list of step numbers (positions in self.steps), None if a step has no atoms
+    def orderSteps(self, model_mgr):
+        cardinality = [model_mgr.getCardinality(step.pred_key) for step in self.steps]
+        if 0 in cardinality: # there is no solution
+            return None
+        if len(self.steps) == 1:
+            return self.body_order
+        remaining, bound, order = range(len(self.steps)), set(self.valued_vars), []
+        while remaining:
+            num_bound = lambda num: len([var for var, _ in self.steps[num].var_positions if var in bound])
+            next_num  = min(remaining, key=lambda num: (-num_bound(num), cardinality[num], num))
+            remaining.remove(next_num)
+            order.append(next_num)
+            bound.update([var for var, _ in self.steps[next_num].var_positions])
+        return order
+
+    ##
+    # @param order step numbers in the order they're matched, see orderSteps()
+    # @param first_only stop after the first solution
+    # @return list of solutions, a solution is a list with the grounding of every step
+    def search(self, order, model_mgr, assignment, first_only=False):
+        solutions = []
+        if order != None:
+            values = dict([(var, value) for var, value in assignment.items() if value != None])
+            self.searchFrom(order, 0, model_mgr, values, [None] * len(self.steps), solutions, first_only)
+        return solutions
+
+    # depth first search, values are updated in place and restored on backtracking
+    # @return True if the search should stop
+    def searchFrom(self, order, depth, model_mgr, values, groundings, solutions, first_only):
+        if depth == len(order):
+            solutions.append(list(groundings))
+            return first_only
+        step_num = order[depth]
+        step = self.steps[step_num]
+        partial_assign = [None] * len(step.variables)
+        new_vars = []
+        for var, positions in step.var_positions:
+            if var in values:
+                for pos in positions:
+                    partial_assign[pos] = values[var]
+            else:
+                new_vars.append((var, positions))
+        for grounding in model_mgr.unify(step.pred_key, partial_assign):
+            # a new variable that is checked at several positions needs the same value at each
+            if not all([len(set([grounding[pos] for pos in positions])) == 1 for _, positions in new_vars]):
+                continue
+            for var, positions in new_vars:
+                values[var] = grounding[positions[0]]
+            groundings[step_num] = grounding
+            if self.searchFrom(order, depth + 1, model_mgr, values, groundings, solutions, first_only):
+                return True
+            for var, _ in new_vars:
+                del values[var]
+        return False
+
+    # @return function for sorting solutions in the order a search in body order finds them
+    def getSortKey(self, model_mgr):
+        positions = [model_mgr.getPositions(step.pred_key) for step in self.steps]
+        return lambda solution: [pos[grounding] for pos, grounding in zip(positions, solution)]
+
+    # @return copy of assignment, updated with the values of the variables of every step
+    def makeAssignment(self, solution, assignment):
+        new_assign = dict(assignment)
+        for step, grounding in zip(self.steps, solution):
+            new_assign.update(zip(step.variables, grounding))
+        return new_assign
@@ -0,0 +1,212 @@
+#!/usr/bin/env python
+#
+# Author:   Armando Diaz Tolentino <ajdt@cs.washington.edu>
+#
+# Desc:     Creates a set of files, each one corresponding to one problem
+#           generated by eqn_generator.lp (replaces make_algebra_probs.sh).
+#           After generation, every problem goes through the pipeline
+#               all_solutions.lp (all solutions, optimal one marked) -> merge -> visualizer
+#           in a pool of worker processes. Each finished problem is recorded in
+#           a checkpoint file, so an interrupted run can be resumed with --resume.
+#           With --batchSolve every worker grounds all_solutions.lp once and solves
+#           its problems by setting external atoms (see batch_solve.py).
+#
+import os
+import json
+import time
+import random
+import argparse
+import subprocess
+import multiprocessing
+from collections import defaultdict
+import merge_solutions
+import witness_reader
+import seen_problems
+
+PROB_DIR, SOLN_DIR, GEN_PROB_DIR, JSON_PROB_DIR = 'probs', 'soln', 'gen_prob', 'json_prob'
+CHECKPOINT_FILE = 'finished_problems.txt'
+STAGES = ['all_solutions', 'merge', 'visualize']
+batch_solver = None # per worker batch_solve.BatchSolver, with --batchSolve only
+
+# pool initializer, grounds all_solutions.lp once in every worker process
+def initBatchWorker(clingo_args):
+    global batch_solver
+    import batch_solve # NOTE: imported here, clingo's python module is only needed with --batchSolve
+    batch_solver = batch_solve.BatchSolver('all_solutions.lp', batch_solve.DEFAULT_ARGS + clingo_args)
+
+# @param clingo_args list of clingo options and input files
+# @return clingo's json output (a string)
+def runClingo(clingo_args):
+    process = subprocess.Popen(['clingo'] + clingo_args + ['--outf=2'], stdout=subprocess.PIPE)
+    return process.communicate()[0]
+
+# write to a temporary file first, so a killed worker never leaves a partial file behind
+def writeFileAtomically(file_name, contents):
+    temp_name = file_name + '.tmp'
+    out_file = open(temp_name, 'w')
+    out_file.write(contents)
+    out_file.close()
+    os.rename(temp_name, file_name)
+
+def generateProblems(num_problems, seed, clingo_args, seen_set=None):
+    """ run eqn_generator.lp and write the initial state of each problem to PROB_DIR/N.prob
+        if seen_set is given, problems in seen_set or repeated in this run are skipped
+        returns a dict prob_name --> problem hash (None without seen_set)"""
+    cmd = ['clingo', 'eqn_generator.lp', '--project', '-n', str(num_problems), '--sign-def=3', '--seed=' + str(seed)] + clingo_args + ['--outf=2']
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE)
+    prob_hashes, batch_hashes, num_duplicates = {}, set(), 0
+    # witnesses are streamed, underscores are kept since the atoms are written back out as facts
+    for witness in witness_reader.WitnessReader(process.stdout).witnesses():
+        initial_atoms = [atom for atom in witness['Value'] if atom.startswith('_holds(_time(0,1)')]
+        prob_hash = None
+        if seen_set is not None:
+            prob_hash = seen_problems.getProblemHash(witness_reader.stripUnderscores(initial_atoms))
+            if prob_hash in seen_set or prob_hash in batch_hashes:
+                num_duplicates += 1
+                continue
+            batch_hashes.add(prob_hash)
+        prob_name = str(len(prob_hashes) + 1) + '.prob'
+        writeFileAtomically(os.path.join(PROB_DIR, prob_name), '\n'.join([atom + '.' for atom in initial_atoms]) + '\n')
+        prob_hashes[prob_name] = prob_hash
+    process.wait()
+    if seen_set is not None:
+        print('skipped %d duplicate problems' % num_duplicates)
+    return prob_hashes
+
+# @return the problem hash of a .prob file written by generateProblems()
+def readProblemHash(prob_name):
+    prob_file = open(os.path.join(PROB_DIR, prob_name), 'r')
+    facts = [line.strip()[:-1] for line in prob_file if line.strip()] # remove periods
+    prob_file.close()
+    return seen_problems.getProblemHash(witness_reader.stripUnderscores(facts))
+
+def solveProblem(task):
+    """ run the full pipeline for a single problem file, returns (prob_name, stage_timing_dict, error)"""
+    prob_name, clingo_args = task
+    timing = {}
+    try:
+        runPipeline(prob_name, clingo_args, timing)
+    except Exception as err: # report the failure, but keep the other workers going
+        return prob_name, timing, repr(err)
+    return prob_name, timing, None
+
+def runPipeline(prob_name, clingo_args, timing):
+    prob_file = os.path.join(PROB_DIR, prob_name)
+
+    start = time.time()
+    if batch_solver is not None:
+        prob_lines = open(prob_file, 'r')
+        all_soln = json.dumps(batch_solver.solve([line.strip()[:-1] for line in prob_lines if line.strip()]))
+        prob_lines.close()
+    else:
+        all_soln = runClingo(['all_solutions.lp', prob_file, '--project', '-n', '0'] + clingo_args)
+    writeFileAtomically(os.path.join(SOLN_DIR, 'all_soln_for_' + prob_name), all_soln)
+    timing['all_solutions'] = time.time() - start
+
+    # NOTE: no separate eqn_generator.lp run, all_solutions.lp marks the optimal solution
+    start = time.time()
+    merged = merge_solutions.appendOptimalWitness(json.loads(all_soln))
+    writeFileAtomically(os.path.join(GEN_PROB_DIR, prob_name + '.json'), json.dumps(merged))
+    timing['merge'] = time.time() - start
+
+    start = time.time()
+    import totally_new_visualizer # NOTE: imported here, only workers need the visualizer
+    manager = totally_new_visualizer.AnswerSetManager({'json_output': 'true'})
+    for witness in merged['Call'][0]['Witnesses']:
+        manager.addAnswerSet([atom.replace('_', '') for atom in witness['Value']])
+    json_output = json.JSONEncoder().encode(manager.answer_sets_dict) + '\n'
+    writeFileAtomically(os.path.join(JSON_PROB_DIR, prob_name + '.json.json'), json_output)
+    timing['visualize'] = time.time() - start
+
+def readCheckpoint():
+    if not os.path.exists(CHECKPOINT_FILE):
+        return set()
+    checkpoint = open(CHECKPOINT_FILE, 'r')
+    finished = set([line.strip() for line in checkpoint if line.strip()])
+    checkpoint.close()
+    return finished
+
+def clearDirectories():
+    for directory in [PROB_DIR, SOLN_DIR, GEN_PROB_DIR, JSON_PROB_DIR]:
+        if not os.path.isdir(directory):
+            os.mkdir(directory)
+        for file_name in os.listdir(directory):
+            os.remove(os.path.join(directory, file_name))
+    if os.path.exists(CHECKPOINT_FILE):
+        os.remove(CHECKPOINT_FILE)
+
+def printTiming(stage_times, num_solved, wall_time):
+    print('solved %d problems in %.2fs' % (num_solved, wall_time))
+    for stage in ['generate'] + STAGES:
+        times = stage_times[stage]
+        if times:
+            print('%-18s total %8.2fs  mean %6.2fs  max %6.2fs' % (stage, sum(times), sum(times)/len(times), max(times)))
+
+def main(cmd_line_args):
+    clingo_args = cmd_line_args.clingo.split()
+    stage_times = defaultdict(list)
+    start = time.time()
+
+    # problems solved in earlier runs are skipped, unless duplicates are allowed
+    seen_set = None if cmd_line_args.allowDuplicates else seen_problems.SeenProblemSet(cmd_line_args.seenFile)
+
+    # generate problems, unless we're resuming an interrupted run
+    if cmd_line_args.resume and os.path.isdir(PROB_DIR) and os.listdir(PROB_DIR):
+        prob_names = sorted([name for name in os.listdir(PROB_DIR) if name.endswith('.prob')])
+        prob_hashes = dict([(name, readProblemHash(name) if seen_set is not None else None) for name in prob_names])
+    else:
+        clearDirectories()
+        gen_start = time.time()
+        prob_hashes = generateProblems(cmd_line_args.numProblems, cmd_line_args.seed, clingo_args, seen_set)
+        prob_names = sorted(prob_hashes.keys())
+        stage_times['generate'].append(time.time() - gen_start)
+
+    finished = readCheckpoint()
+    tasks = [(prob_name, clingo_args) for prob_name in prob_names if prob_name not in finished]
+    print('solving %d problems (%d already finished) with %d workers' % (len(tasks), len(prob_names)-len(tasks), cmd_line_args.workers))
+
+    num_solved = 0
+    if cmd_line_args.batchSolve:
+        pool = multiprocessing.Pool(processes=cmd_line_args.workers, initializer=initBatchWorker, initargs=(clingo_args,))
+    else:
+        pool = multiprocessing.Pool(processes=cmd_line_args.workers)
+    checkpoint = open(CHECKPOINT_FILE, 'a')
+    try:
+        for prob_name, timing, error in pool.imap_unordered(solveProblem, tasks):
+            if error is not None:
+                print('failed on %s: %s' % (prob_name, error))
+                continue
+            num_solved += 1
+            checkpoint.write(prob_name + '\n')
+            checkpoint.flush()
+            os.fsync(checkpoint.fileno())
+            if seen_set is not None:
+                seen_set.add(prob_hashes[prob_name])
+            for stage, seconds in timing.items():
+                stage_times[stage].append(seconds)
+        pool.close()
+    except KeyboardInterrupt:
+        pool.terminate()
+        raise
+    finally:
+        checkpoint.close()
+        pool.join()
+        if seen_set is not None:
+            seen_set.close()
+
+    printTiming(stage_times, num_solved, time.time() - start)
+
+def getCmdLineArgs():
+    cmd_parser = argparse.ArgumentParser(description='generate algebra problems and their solutions')
+    cmd_parser.add_argument('--numProblems', type=int, default=50, required=False)
+    cmd_parser.add_argument('--seed', type=int, default=random.randint(0, 32767), required=False)
+    cmd_parser.add_argument('--workers', type=int, default=multiprocessing.cpu_count(), required=False)
+    cmd_parser.add_argument('--clingo', default='', required=False) # additional clingo options, e.g. '-c maxSteps=2'
+    cmd_parser.add_argument('--resume', action='store_true') # continue an interrupted run
+    cmd_parser.add_argument('--seenFile', default=seen_problems.SEEN_FILE, required=False) # hashes of problems solved in earlier runs
+    cmd_parser.add_argument('--allowDuplicates', action='store_true') # don't skip problems that were seen before
+    cmd_parser.add_argument('--batchSolve', action='store_true') # ground all_solutions.lp once per worker, not once per problem
+    return cmd_parser.parse_args()
+
+if __name__ == "__main__":
+    main(getCmdLineArgs())
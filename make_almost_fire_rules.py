@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+#
+# Author:   Armando Diaz Tolentino <ajdt@cs.washington.edu>
+#
+# Desc:     Generates almost_fire.lp, the 'almost fire' explanations for all_solutions.lp.
+#           A heuristic almost fires when every level two condition (see
+#           getLevelTwoPredicates()) but one holds. For every heuristic and every
+#           condition that may be the missing one (see makeListOfAlmostFireConditions())
+#           a rule derives
+#               _almostApplicable(Time, HeurName, _operands(..), MissingCondition)
+#           so clingo does the joins while grounding, and totally_new_visualizer.py only
+#           formats the atoms. Values the other conditions don't give are _unassigned.
+#           Re-run this script whenever rules.lp changes, then check the rules
+#           against the search in Python (see check_almost_fire.py):
+#               python make_almost_fire_rules.py > almost_fire.lp
+#
+import sys
+import parse_asp_rules as par
+import explanation_extractor as explain
+
+ALMOST_APPLICABLE   = '_almostApplicable'
+MISSING_COND_HOLDS  = '__missingCondHolds' # the missing condition holds for the values of the other conditions
+UNASSIGNED          = '_unassigned'
+TIME_VARIABLE       = 'Time'
+TIME_DOMAIN         = '__validTime'
+
+def isVariable(term):
+    return isinstance(term, str) and term[:1].isupper()
+
+# @return list of the variables in term (a condition or one of its arguments), in order of first use
+def getVariables(term):
+    if isinstance(term, str):
+        return [term] if isVariable(term) else []
+    variables = []
+    for arg in term.args or []:
+        variables += [var for var in getVariables(arg) if var not in variables]
+    return variables
+
+# @param rename function giving the string used for a variable
+# @return ASP string of term, a condition or one of its arguments
+def termToString(term, rename=lambda var: var):
+    if isinstance(term, str):
+        return rename(term) if isVariable(term) else term
+    if not term.args:
+        return term.name
+    return term.name + '(' + ', '.join([termToString(arg, rename) for arg in term.args]) + ')'
+
+def literalToString(cond):
+    return ('not ' if isinstance(cond, par.NegPredicate) else '') + termToString(cond)
+
+def makeRuleString(head, body):
+    return head + '\n\t:-\t' + ',\n\t\t'.join(body) + '.'
+
+##
+# @param rule_num distinguishes the MISSING_COND_HOLDS atoms of different rules
+# @return list of lines: the rules for one missing condition of a heuristic, or a
+#       comment saying why there are none
+def makeAlmostApplicableRules(heur_name, operand_vars, excluded, other_cond, rule_num):
+    excluded_string = termToString(excluded)
+    if any([isinstance(cond, par.ParseError) for cond in other_cond]):
+        # NOTE: the dropped part is usually a comparison (==), without it the rules would be wrong
+        return ['% skipped ' + excluded_string + ': parse_asp_rules dropped part of a rule it comes from']
+    if not all([isinstance(cond, (par.Predicate, par.NegPredicate)) for cond in other_cond]):
+        # NOTE: parse_asp_rules only keeps the left side of a comparison
+        return ['% skipped ' + excluded_string + ': the other conditions have a comparison']
+    positive = [cond for cond in other_cond if isinstance(cond, par.Predicate)]
+    if len(positive) == 0:
+        return ['% skipped ' + excluded_string + ': no other condition to match']
+    if excluded in positive:
+        return ['% skipped ' + excluded_string + ': it is also one of the other conditions']
+    bound = set(sum([getVariables(cond) for cond in positive], []))
+    body = []
+    for cond in other_cond:
+        if literalToString(cond) not in body:
+            body.append(literalToString(cond))
+    if TIME_VARIABLE not in bound: # explanations are for a time step
+        body.insert(0, TIME_DOMAIN + '(' + TIME_VARIABLE + ')')
+        bound.add(TIME_VARIABLE)
+    negated = [cond for cond in other_cond if isinstance(cond, par.NegPredicate)]
+    if not all([var in bound for cond in negated for var in getVariables(cond)]):
+        return ['% skipped ' + excluded_string + ': a negated condition has unbound variables']
+
+    # the missing condition is checked for the values of the bound variables only
+    rules = []
+    excluded_vars = getVariables(excluded)
+    bound_vars = [var for var in excluded_vars if var in bound]
+    if len(bound_vars) == len(excluded_vars):
+        body.append('not ' + excluded_string)
+    else:
+        holds_atom = MISSING_COND_HOLDS + '(' + ', '.join([str(rule_num)] + bound_vars) + ')'
+        rules.append(makeRuleString(holds_atom, [excluded_string]))
+        body.append('not ' + holds_atom)
+
+    assigned = lambda var: var if var in bound else UNASSIGNED
+    operands = '_operands(' + ', '.join([termToString(var, assigned) for var in operand_vars]) + ')'
+    head_args = [TIME_VARIABLE, heur_name, operands, termToString(excluded, assigned)]
+    rules.append(makeRuleString(ALMOST_APPLICABLE + '(' + ', '.join(head_args) + ')', body))
+    return rules
+
+# @return the contents of almost_fire.lp for the heuristics of explanation_extractor
+def makeAlmostFireRules():
+    template_mgr = explain.getTemplateManager()
+    lines = ['% generated by make_almost_fire_rules.py, do not edit by hand!', '%',
+            '% ' + ALMOST_APPLICABLE + '(Time, HeurName, _operands(..), MissingCondition)',
+            '%\tevery level two condition of HeurName but MissingCondition holds at Time.',
+            '%\tVariables the other conditions leave unbound are ' + UNASSIGNED,
+            '#show ' + ALMOST_APPLICABLE + '/4.']
+    rule_num = 0
+    for heur_name, heur_key in sorted(template_mgr.heuristic_to_heur_key.items()):
+        lines += ['', '%%%% ' + heur_name + ' %%%%']
+        level_two_preds = explain.getLevelTwoPredicates(heur_key)
+        if len(level_two_preds) == 0:
+            lines.append('% skipped: no level two conditions')
+            continue
+        # rule head looks like : _applicable(T, _rule(HeurName, _operands(..)))
+        operand_vars = template_mgr.lookupTemplateFor(heur_key).rule.head.args[1].args[1].args
+        for excluded, other_cond in explain.makeListOfAlmostFireConditions(level_two_preds):
+            rule_num += 1
+            lines += makeAlmostApplicableRules(heur_name, operand_vars, excluded, other_cond, rule_num)
+    return '\n'.join(lines) + '\n'
+
+if __name__ == "__main__":
+    sys.stdout.write(makeAlmostFireRules())
@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+#
+# Author:   Armando Diaz Tolentino <ajdt@cs.washington.edu>
+#
+# Desc:     Generates show_projection.lp, the #show directives included by
+#           eqn_generator.lp and all_solutions.lp. Only three kinds of atoms are
+#           shown:
+#               1. predicates consumed by the visualizers (eqn_viz.py, totally_new_visualizer.py)
+#               2. predicates clingo's --project projects solutions onto (see eqn_solver.lp)
+#               3. predicates that explanation templates unify against, i.e. every
+#                  predicate used by a rule in rules.lp (found by parsing rules.lp
+#                  with parse_asp_rules, like explanation_extractor does)
+#           Re-run this script whenever rules.lp changes:
+#               python make_show_directives.py > show_projection.lp
+#           and check that every predicate the visualizers parse is still shown:
+#               python make_show_directives.py --check
+#
+#           NOTE: this shrinks the output about 2.4x, not by an order of magnitude.
+#           On 5 models of the default config the atoms per model drop from 1988 to
+#           836. Most of the rest are two static relations (__isLessThan and
+#           __areOnTheSameSideOfTheEquation) the 'almost fire' explanations need.
+#
+import re
+import sys
+import argparse
+import parse_asp_rules as par
+import explanation_extractor as explain
+
+# name/arity of predicates parsed by the visualizers
+VISUALIZER_PREDICATES = [
+    ('_selectedHeuristic', 2), ('_selectedHeurOperands', 2),
+    ('_factor1', 3), ('_factor2', 3), ('_factor3', 3), ('_factor4', 3),
+    ('_strategyExplanation', 2), ('_optimalHeuristicInstance', 2),
+    ('_solutionValue', 3), ('_substitutedDegree', 2), ('__referTo', 3),
+    ('_applicableHeuristic', 2),
+    ]
+
+# name/arity of predicates solutions are projected onto by clingo --project
+# NOTE: clingo ignores atoms that aren't shown when projecting
+PROJECTION_PREDICATES = [('selectedHeuristic', 1)]
+
+# _holds facts are shown for regular nodes only, facts about temp nodes are never used
+HOLDS_DIRECTIVE = '#show _holds(Time, _fact(Node, Fluent)) : _holds(Time, _fact(Node, Fluent)), _node(Node).'
+
+# @return (name, arity) keys of the predicates in a rule body, comparisons have none
+def getConditionKeys(conditions):
+    keys = []
+    for cond in conditions:
+        if isinstance(cond, par.PredCount):
+            keys += getConditionKeys([cond.predicate] + (cond.conditions or []))
+        elif isinstance(cond, (par.Predicate, par.NegPredicate)):
+            keys.append((cond.name, cond.arity))
+    return keys
+
+# @return dictionary (name, arity) of a rule head --> list of (name, arity) keys used in its bodies
+def getRuleBodyKeys(rules_file):
+    body_keys = {}
+    for rule in explain.getRulesListFromFile(rules_file):
+        head_key = (rule.head.name, rule.head.arity)
+        body_keys.setdefault(head_key, []).extend(getConditionKeys(rule.body))
+    return body_keys
+
+# Templates unify the body of a heuristic rule (_applicable) against the model, and
+# 'almost fire' explanations go one level deeper (see explanation_extractor.getLevelTwoPredicates())
+# @param rules_file the file containing the heuristics used for explanations
+# @return sorted list of (name, arity) keys that templates look up in a model
+def getExplanationPredicateKeys(rules_file='rules.lp'):
+    body_keys = getRuleBodyKeys(rules_file)
+    level_one = set(body_keys.get(('_applicable', 2), []))
+    pred_keys = set(level_one)
+    for key in level_one:
+        pred_keys.update(body_keys.get(key, []))
+    # _holds is handled by HOLDS_DIRECTIVE
+    return sorted([key for key in pred_keys if key[0] != '_holds'])
+
+def makeShowDirectives(rules_file='rules.lp'):
+    lines = ['% generated by make_show_directives.py, do not edit by hand!', '',
+            '% predicates used by the visualizers', HOLDS_DIRECTIVE]
+    lines += ['#show ' + name + '/' + str(arity) + '.' for name, arity in VISUALIZER_PREDICATES]
+    lines += ['', '% predicates used by clingo --project']
+    lines += ['#show ' + name + '/' + str(arity) + '.' for name, arity in PROJECTION_PREDICATES]
+    lines += ['', '% predicates used by explanation templates (from ' + rules_file + ')']
+    lines += ['#show ' + name + '/' + str(arity) + '.' for name, arity in getExplanationPredicateKeys(rules_file)
+                if (name, arity) not in VISUALIZER_PREDICATES]
+    return '\n'.join(lines) + '\n'
+
+SHOW_REGEX = re.compile(r'^#show\s+(\w+)', re.MULTILINE)
+
+# @return set of names (underscores removed, like the visualizers see them) shown by lp_files
+def getShownNames(lp_files):
+    names = set()
+    for lp_file in lp_files:
+        lp_obj = open(lp_file, 'r')
+        names.update([name.replace('_', '') for name in SHOW_REGEX.findall(lp_obj.read())])
+        lp_obj.close()
+    return names
+
+# @return list of (visualizer, names of the predicates it parses, files with the #show directives
+#       of the programs it reads). eqn_viz.py reads eqn_generator.lp, totally_new_visualizer.py
+#       reads all_solutions.lp too
+def getVisualizerChecks():
+    # NOTE: imported here, generating the directives needs neither visualizer
+    import eqn_viz
+    import totally_new_visualizer
+    return [('eqn_viz.py', [layout[0].rstrip('(') for parser, layout in eqn_viz.grammar_tokens],
+                ['show_projection.lp']),
+            ('totally_new_visualizer.py', totally_new_visualizer.parsed_predicates,
+                ['show_projection.lp', 'almost_fire.lp'])]
+
+# @return number of predicates a visualizer parses that aren't shown
+def checkShownPredicates():
+    num_missing = 0
+    for visualizer, names, lp_files in getVisualizerChecks():
+        for name in sorted(set(names) - getShownNames(lp_files)):
+            print('%s parses %s, not shown by %s' % (visualizer, name, ', '.join(lp_files)))
+            num_missing += 1
+    return num_missing
+
+def getCmdLineArgs():
+    cmd_parser = argparse.ArgumentParser(description='generate the #show directives of show_projection.lp')
+    cmd_parser.add_argument('rules_file', nargs='?', default='rules.lp')
+    cmd_parser.add_argument('--check', action='store_true') # check show_projection.lp instead of generating it
+    return cmd_parser.parse_args()
+
+if __name__ == "__main__":
+    args = getCmdLineArgs()
+    if args.check:
+        sys.exit(1 if checkShownPredicates() else 0)
+    sys.stdout.write(makeShowDirectives(args.rules_file))
@@ -1,7 +1,6 @@
 import sys
 import json
 
-first_file, snd_file, result_file = sys.argv[1:]
 def getJSONObjectFromFile(file_name):
     file_obj = file(file_name, 'r')
     input_string = file_obj.read()
@@ -18,15 +17,40 @@ def mergeJSONObjects(fst_obj, snd_obj):
     fst_obj['Call'][0]['Witnesses'].append(snd_obj_witnesses[0])
     return fst_obj
 
+# all_solutions.lp shows this atom in the solution eqn_solver.lp would find
+OPTIMAL_MARKER = '_isOptimalSolution'
+
+# single pass version of mergeJSONObjects(): the witnesses of an all_solutions.lp run
+# already contain the optimal solution, a copy of it is appended like mergeJSONObjects() does
+# NOTE: the markers are removed, the visualizers don't expect them
+def appendOptimalWitness(json_obj):
+    witnesses = json_obj['Call'][0].setdefault('Witnesses', [])
+    optimal_witness = None
+    for witness in witnesses:
+        if OPTIMAL_MARKER in witness['Value']:
+            witness['Value'].remove(OPTIMAL_MARKER)
+            if optimal_witness is None:
+                optimal_witness = {'Value': list(witness['Value'])}
+    if optimal_witness is None:
+        raise ValueError('none of the %d solutions is marked optimal' % len(witnesses))
+    witnesses.append(optimal_witness)
+    return json_obj
+
 def writeObjectToJSONFile(obj, file_name):
     file_obj = file(file_name, 'w')
     file_obj.write(json.dumps(obj))
     file_obj.close()
 
-fst_obj         = getJSONObjectFromFile(first_file)
-snd_obj         = getJSONObjectFromFile(snd_file)
-new_json_obj    = mergeJSONObjects(fst_obj, snd_obj)
-writeObjectToJSONFile(new_json_obj, result_file)
+if __name__ == "__main__":
+    if len(sys.argv) == 3: # single pass: all_soln_file result_file
+        all_soln_file, result_file = sys.argv[1:]
+        new_json_obj    = appendOptimalWitness(getJSONObjectFromFile(all_soln_file))
+    else:
+        first_file, snd_file, result_file = sys.argv[1:]
+        fst_obj         = getJSONObjectFromFile(first_file)
+        snd_obj         = getJSONObjectFromFile(snd_file)
+        new_json_obj    = mergeJSONObjects(fst_obj, snd_obj)
+    writeObjectToJSONFile(new_json_obj, result_file)
 
 #print json_obj['Call'][0]['Witnesses'].__class__
 #return decoded_output['Call'][0]['Witnesses'] 
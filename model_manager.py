@@ -3,9 +3,11 @@
 # Author:   Armando Diaz Tolentino <ajdt@cs.washington.edu> 
 #
 # Desc:     Manages a single answer set's predicates and handles unification
-#           when we generate explanations.
+#           when we generate explanations. TimePartitionedModel keeps one
+#           ModelManager per time step, so a step is explained with its own atoms.
 #
 from collections import defaultdict
+import pred_parser
 
 class ModelManager(object):
     """records every atom for a generated model (answer set)"""
@@ -13,22 +15,69 @@ class ModelManager(object):
     def __init__(self):
         super(ModelManager, self).__init__()
         self.model_predicates = defaultdict(list)
+        # hash indexes, built by unify() the first time a combination of argument
+        # positions is bound: pred_key --> {bound positions --> {values --> groundings}}
+        self.indexes = defaultdict(dict)
+        self.positions = {} # pred_key --> {grounding --> position}, see getPositions()
     def addPredicate(self, predicate_string):
         """add grounded predicate to model"""
-        pred_name, operands = ModelManager.splitPredicate(predicate_string)
-        pred_key = (pred_name, len(operands))
+        # remove all whitespace first
+        self.addParsedPredicate(pred_parser.predicateStringToParsedPredicate(''.join(predicate_string.split())))
+
+    def addParsedPredicate(self, pred_obj):
+        """add grounded predicate (a pred_parser.ParsedPredicate) to model"""
+        # NOTE: operands are the interned term's tuple of argument strings, not a copy
+        operands = pred_obj.arg_strings
+        pred_key = (pred_obj.name, len(operands))
         self.model_predicates[pred_key].append(operands)
+        self.positions.pop(pred_key, None)
+        # keep indexes that were already built up to date
+        for positions, index in self.indexes.get(pred_key, {}).items():
+            index.setdefault(ModelManager.getIndexKey(operands, positions), []).append(operands)
 
+    # @param partial_assign list with a value or None for every argument
+    # @return groundings of pred_key that match partial_assign, in the order they were added
     def unify(self, pred_key, partial_assign):
         if not self.model_predicates.has_key(pred_key):
             return []
         match_key = self.model_predicates[pred_key]
-        return [grounding for grounding in match_key if self.matches(grounding, partial_assign)]
+        if len(partial_assign) != pred_key[1]: # matches() pads the shorter list with None
+            return [grounding for grounding in match_key if self.matches(grounding, partial_assign)]
+        positions = tuple([pos for pos, value in enumerate(partial_assign) if value != None])
+        if len(positions) == 0:
+            return list(match_key)
+        index = self.getIndex(pred_key, positions)
+        return list(index.get(ModelManager.getIndexKey(partial_assign, positions), []))
+
+    # @return index of pred_key's groundings by their values at positions, built on first use
+    def getIndex(self, pred_key, positions):
+        key_indexes = self.indexes[pred_key]
+        if positions not in key_indexes:
+            index = {}
+            for grounding in self.model_predicates[pred_key]:
+                index.setdefault(ModelManager.getIndexKey(grounding, positions), []).append(grounding)
+            key_indexes[positions] = index
+        return key_indexes[positions]
+
+    @staticmethod
+    def getIndexKey(values, positions):
+        return tuple([values[pos] for pos in positions])
 
     def matches(self, grounding, partial_assign):
         # checks if partial assignment of variables is consistent with given grounding
         return all(map(lambda x,y: x == y or y == None, grounding, partial_assign))
 
+    # @return number of groundings of pred_key
+    def getCardinality(self, pred_key):
+        return len(self.model_predicates.get(pred_key, []))
+
+    # @return dictionary grounding --> position of the grounding in the order unify() returns them
+    def getPositions(self, pred_key):
+        if pred_key not in self.positions:
+            groundings = self.model_predicates.get(pred_key, [])
+            self.positions[pred_key] = dict([(grounding, pos) for pos, grounding in reversed(list(enumerate(groundings)))])
+        return self.positions[pred_key]
+
     # TODO: remove, for testing purposes only
     def printModel(self):
         for pred_key, val_list in self.model_predicates.items():
@@ -40,35 +89,8 @@ class ModelManager(object):
     def splitPredicate(pred_string):
         """return predicate name and list of operands from predicate string"""
         # remove all whitespace first
-        pred_string = ''.join(pred_string.split())
-        open_paren  = pred_string.find('(')
-        close_paren = pred_string.rfind(')')
-
-        if open_paren == -1 or close_paren == -1:
-            return (pred_string, [])
-            
-        pred_name       = pred_string[:open_paren]
-        operand_str     = pred_string[open_paren+1:close_paren]
-        # split operands into an array
-        start_idx       = 0
-        paren_level     = 0
-
-        operands = []
-        for index in range(0, len(operand_str)):
-            if operand_str[index] == '(':
-                paren_level += 1
-            elif operand_str[index] == ')':
-                paren_level -= 1
-            elif operand_str[index] == ',' and paren_level == 0:
-                operands.append(operand_str[start_idx:index])
-                start_idx = index + 1
-                continue
-
-            # add the last operand
-            if index == len(operand_str) - 1 and paren_level == 0: 
-                operands.append(operand_str[start_idx:])
-                
-        return (pred_name, operands)
+        pred_obj = pred_parser.predicateStringToParsedPredicate(''.join(pred_string.split()))
+        return (pred_obj.name, list(pred_obj.arg_strings))
 
     # TODO: figure out how this code is used externally
     # TODO: any redundant code above is depricated
@@ -77,10 +99,70 @@ class ModelManager(object):
     #       and rule objects defined in parse_asp_rules.py.
 
     # get all ground instances of a certain predicate key
-    def getAllGroundInstancesOf(self, pred_key):
+    # @param partial_assign if given, only the instances that match it (see unify())
+    def getAllGroundInstancesOf(self, pred_key, partial_assign=None):
+        if partial_assign is not None:
+            return self.unify(pred_key, partial_assign)
         return list(self.model_predicates[pred_key])
 
         
 
+##
+# records every atom of an answer set, partitioned by its time term when it is
+# added. Atoms without a time term are time-independent and shared by every step
+class TimePartitionedModel(object):
+    def __init__(self):
+        super(TimePartitionedModel, self).__init__()
+        self.partitions = defaultdict(ModelManager) # pred_parser.Time --> ModelManager
+        self.shared     = ModelManager()            # time-independent atoms
+
+    def addPredicate(self, predicate_string):
+        self.addParsedPredicate(pred_parser.predicateStringToParsedPredicate(''.join(predicate_string.split())))
+
+    def addParsedPredicate(self, pred_obj):
+        time = pred_parser.getTimeFromPredObject(pred_obj)
+        if time == None:
+            self.shared.addParsedPredicate(pred_obj)
+        else:
+            self.partitions[time].addParsedPredicate(pred_obj)
+
+    # @return a ModelView over the atoms of every time stream at step, and the shared atoms
+    def getStepView(self, step):
+        step_partitions = [mgr for time, mgr in sorted(self.partitions.items()) if time.step == step]
+        return ModelView(step_partitions + [self.shared])
+
+##
+# read-only view over several ModelManager instances, that can be used in place
+# of a ModelManager to generate explanations
+# NOTE: groundings are returned partition by partition, a predicate is usually
+#       either time-independent or has its time term, so their order is unchanged
+class ModelView(object):
+    def __init__(self, managers):
+        super(ModelView, self).__init__()
+        self.managers = managers
+        self.positions = {} # NOTE: cached, the managers shouldn't change once the view is used
+
+    def unify(self, pred_key, partial_assign):
+        return [grounding for mgr in self.managers for grounding in mgr.unify(pred_key, partial_assign)]
+
+    def matches(self, grounding, partial_assign):
+        return self.managers[0].matches(grounding, partial_assign)
+
+    def getCardinality(self, pred_key):
+        return sum([mgr.getCardinality(pred_key) for mgr in self.managers])
 
+    def getPositions(self, pred_key):
+        if pred_key not in self.positions:
+            positions, offset = {}, 0
+            for mgr in self.managers:
+                for grounding, pos in mgr.getPositions(pred_key).items():
+                    positions.setdefault(grounding, offset + pos)
+                offset += mgr.getCardinality(pred_key)
+            self.positions[pred_key] = positions
+        return self.positions[pred_key]
 
+    def getAllGroundInstancesOf(self, pred_key, partial_assign=None):
+        # NOTE: doesn't use ModelManager.getAllGroundInstancesOf(), that adds empty keys
+        if partial_assign is None:
+            return [grounding for mgr in self.managers for grounding in mgr.model_predicates.get(pred_key, [])]
+        return self.unify(pred_key, partial_assign)
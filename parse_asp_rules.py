@@ -10,6 +10,7 @@ NegPredicate        =   namedtuple('NegPredicate', ['name', 'args', 'arity'])
 Rule                =   namedtuple('Rule', ['head', 'body'])
 Comparison          =   namedtuple('Comparison', ['left', 'comparator'] )
 PredCount           =   namedtuple('PredCount', ['left_count', 'predicate', 'conditions', 'right_count']) # body is list of conditions
+ParseError          =   namedtuple('ParseError', ['line', 'text']) # conditions near line may be missing from the body
 
 # try get token stream? or consume
 class RuleListener(PrologRulesListener):
@@ -31,7 +32,7 @@ class RuleListener(PrologRulesListener):
     def exitPrologrule(self, ctx):
         parsed_rule = self.popContainer()
         head = parsed_rule[0]
-        body = parsed_rule[1:]
+        body = parsed_rule[1:] + getParseErrors(ctx) # mark rules the parser couldn't parse completely
         self.appendToLastContainer(Rule(head, body))
     def enterPredicate(self, ctx):
         self.pushContainer([])
@@ -138,6 +139,18 @@ class RuleListener(PrologRulesListener):
     def popLastPredicate(self):
         return self.container_stack[-1].pop()
 
+# the parser recovers from a syntax error (e.g. comparisons with ==, which the grammar doesn't
+# know) by dropping tokens, and leaves an error node where it dropped or made up a token
+# @return a ParseError for every error node under ctx
+def getParseErrors(ctx):
+    errors = []
+    for child in ctx.getChildren():
+        if isinstance(child, ErrorNode):
+            errors.append(ParseError(child.symbol.line, child.getText()))
+        elif isinstance(child, ParserRuleContext):
+            errors += getParseErrors(child)
+    return errors
+
 def parseRulesFromFile(file_name):
     """return a list of ASP rules parsed from given file
         XXX: expects the file to contain only rules (no const definitions, facts, comments, or constraints). Other functions handle cleanup
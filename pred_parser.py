@@ -2,23 +2,101 @@
 #
 # Author:   Armando Diaz Tolentino <ajdt@cs.washington.edu> 
 #
-# Desc:     Provides functions to convert a predicate string into a namedtuple()
+# Desc:     Provides functions to convert a predicate string into a ParsedPredicate
 #           (the simplest parsing I could think to do), and helpers to 
 #           extract useful information once a predicate is in this format.
+#           Parsed predicates are hash-consed: a TermTable stores every distinct
+#           (sub)term once, so the atoms shared by the witnesses of a run, and
+#           subterms like time(0,1) or id(2,1), are parsed and allocated only once.
+#           Each run (an AnswerSetManager) owns its table, nothing is kept globally.
 #
 from collections import namedtuple
-ParsedPredicate = namedtuple('ParsedPredicate', ['name', 'args'])
 Time            = namedtuple('Time', ['step', 'stream'])
 
+##
+# a parsed (sub)term, always obtained from a TermTable and never modified.
+# args is None for constants, otherwise a tuple of ParsedPredicate objects
+class ParsedPredicate(object):
+    __slots__ = ('name', 'args', 'string', 'arg_strings')
+    def __init__(self, name, args, string):
+        self.name           = name
+        self.args           = args
+        self.string         = string # same as predObjectToString()
+        # strings of the arguments, the operands ModelManager stores
+        self.arg_strings    = () if args is None else tuple([arg.string for arg in args])
+
+    def __eq__(self, other):
+        return isinstance(other, ParsedPredicate) and self.string == other.string
+    def __ne__(self, other):
+        return not self == other
+    def __hash__(self):
+        return hash(self.string)
+    def __repr__(self):
+        return 'ParsedPredicate(name=%r, args=%r)' % (self.name, self.args)
+
+##
+# interns parsed terms by their string, each distinct term is parsed once
+class TermTable(object):
+    def __init__(self):
+        super(TermTable, self).__init__()
+        self.terms = {} # term string --> ParsedPredicate
+        self.symbols = {} # clingo Symbol --> ParsedPredicate
+
+    # @param [string] a predicate string like 'this_is_apred(with, some, args)'
+    # @return the ParsedPredicate for string, shared by every caller
+    def parse(self, string):
+        term = self.terms.get(string)
+        if term is None:
+            string = str(string) # use str() constructor to avoid unicode strings
+            if '(' in string:
+                name_string, arg_string = splitOnOutermostParens(string)
+                args = tuple([self.parse(arg) for arg in splitPredicateArguments(arg_string)])
+                term = ParsedPredicate(name_string, args, string)
+            else:
+                term = ParsedPredicate(string, None, string)
+            self.terms[string] = term
+        return term
+
+    # @param symbol a clingo Symbol of a model solved in-process (see clingo_backend)
+    # @return the ParsedPredicate for symbol, underscores are removed from names
+    #       (like witness_reader.stripUnderscores()), the symbol is never printed and parsed
+    def fromSymbol(self, symbol):
+        import clingo # NOTE: imported here, only in-process models are Symbols
+        return self.internSymbol(symbol, clingo.SymbolType.Function)
+
+    def internSymbol(self, symbol, function_type):
+        term = self.symbols.get(symbol)
+        if term is None:
+            if symbol.type != function_type: # numbers and strings
+                term = self.parse(str(symbol))
+            elif len(symbol.arguments) == 0:
+                term = self.parse(str(symbol.name.replace('_', '')))
+            else:
+                name = str(symbol.name.replace('_', ''))
+                args = tuple([self.internSymbol(arg, function_type) for arg in symbol.arguments])
+                string = name + '(' + ','.join([arg.string for arg in args]) + ')'
+                term = self.terms.setdefault(string, ParsedPredicate(name, args, string))
+            self.symbols[symbol] = term
+        return term
+
+    def __len__(self):
+        return len(self.terms)
+
 # @param [string] a predicate string like 'this_is_apred(with, some, args)'
-# @return a ParsedPredicate (namedtuple) instance 
-def predicateStringToParsedPredicate(string):
-    # string has arguments
-    if '(' in string:
-        name_string, arg_string = splitOnOutermostParens(string)
-        return ParsedPredicate(name_string, parsePredicateArguments(arg_string))
-    else:
-        return ParsedPredicate(string, None)
+# @param term_table the TermTable to intern the terms in, a new one if not given
+# @return a ParsedPredicate instance 
+def predicateStringToParsedPredicate(string, term_table=None):
+    if term_table is None:
+        term_table = TermTable()
+    return term_table.parse(string)
+
+# @param symbol a clingo Symbol (see TermTable.fromSymbol())
+# @param term_table see predicateStringToParsedPredicate()
+# @return a ParsedPredicate instance
+def symbolToParsedPredicate(symbol, term_table=None):
+    if term_table is None:
+        term_table = TermTable()
+    return term_table.fromSymbol(symbol)
 
 # split a predicate string into name and argument strings
 # example: 'somePred(a,b,c(d,e))' ---> ('somePred', 'a,b,c(d,e)'
@@ -29,9 +107,9 @@ def splitOnOutermostParens(string):
     # use str() constructor to avoid unicode strings
     return (str(string[:left_index]), str(string[left_index+1:right_index]))
 
-# split an argument string into separate arguments and
-# @return a list() of ParsedPredicate objects
-def parsePredicateArguments(arg_string):
+# split an argument string into separate argument strings
+# example: 'a,b,c(d,e)' ---> ['a', 'b', 'c(d,e)']
+def splitPredicateArguments(arg_string):
     separated_arguments     = []
     unmatched_paren_count   = 0
     current_start_index     = 0
@@ -51,18 +129,19 @@ def parsePredicateArguments(arg_string):
     # add last argument in arg_string (all other arguments are preceded by ',' )
     # but loop above misses last one
     separated_arguments.append(arg_string[current_start_index:])
+    return separated_arguments
 
-    return [predicateStringToParsedPredicate(arg) for arg in separated_arguments]
+# split an argument string into separate arguments and
+# @return a list() of ParsedPredicate objects
+def parsePredicateArguments(arg_string):
+    term_table = TermTable()
+    return [term_table.parse(arg) for arg in splitPredicateArguments(arg_string)]
 
 # NOTE: can be called with either pred_obj or a string (required for argsToListOfStrings)
 def predObjectToString(pred_obj):
-    if isinstance(pred_obj, str):
-        return pred_obj # accidentally called with a string instance
-    elif pred_obj.args == None:
-        return str(pred_obj.name)
-    else:
-        arg_string = ','.join([ predObjectToString(arg) for arg in pred_obj.args])
-        return str(pred_obj.name + '(' + arg_string + ')')
+    if isinstance(pred_obj, ParsedPredicate):
+        return pred_obj.string
+    return pred_obj # accidentally called with a string instance
 # return a Time() named tuple for a predicate
 def getTimeFromPredObject(pred_obj):
     if pred_obj.name == 'time':
@@ -87,10 +166,7 @@ def findInArgList(pred_obj, pred_name):
 # @param [pred_obj] an instance of ParsedPredicate
 # @return a list of strings pertaining to 
 def argsToListOfStrings(pred_obj):
-    if pred_obj.args == None:
-        return []
-    else:
-        return [predObjectToString(arg) for arg in pred_obj.args]
+    return list(pred_obj.arg_strings)
 
 
 # return a 3 element list containing [id, field, value] for a parsed holds predicate
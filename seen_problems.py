@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+#
+# Author:   Armando Diaz Tolentino <ajdt@cs.washington.edu>
+#
+# Desc:     Detects generated problems that were already seen, in the same run
+#           or in an earlier one. A problem is identified by the sha1 of its
+#           canonical string (EquationStepParser.getCanonicalString()), so problems
+#           that only differ in the order of add/mul children are duplicates.
+#           Hashes are kept in an sqlite database on disk, 20 bytes per problem.
+#
+import hashlib
+import sqlite3
+import pred_parser
+
+SEEN_FILE = 'seen_problems.db'
+
+# @param predicates list of predicate strings (underscores removed), only
+#       the holds predicates for the initial state (time step 0) are used
+# @return EquationStepParser holding the problem's node_data
+def parseInitialState(predicates):
+    # NOTE: imported here, the visualizer pulls in explanation_extractor and the
+    #       antlr rule parser, SeenProblemSet doesn't need either
+    from totally_new_visualizer import EquationStepParser
+    step_parser = EquationStepParser()
+    term_table  = pred_parser.TermTable()
+    for predicate_string in predicates:
+        if predicate_string.startswith('holds(time(0,'):
+            step_parser.addParsedPredicate(pred_parser.predicateStringToParsedPredicate(predicate_string, term_table))
+    return step_parser
+
+# @param predicates see parseInitialState()
+# @return sha1 digest (raw bytes) of the problem's canonical string
+def getProblemHash(predicates):
+    return hashlib.sha1(parseInitialState(predicates).getCanonicalString()).digest()
+
+class SeenProblemSet(object):
+    """persistent set of problem hashes, see getProblemHash()"""
+    def __init__(self, file_name=SEEN_FILE):
+        super(SeenProblemSet, self).__init__()
+        self.connection = sqlite3.connect(file_name)
+        self.connection.execute('CREATE TABLE IF NOT EXISTS seen (hash BLOB PRIMARY KEY) WITHOUT ROWID')
+
+    def __contains__(self, problem_hash):
+        cursor = self.connection.execute('SELECT 1 FROM seen WHERE hash = ?', (sqlite3.Binary(problem_hash),))
+        return cursor.fetchone() is not None
+
+    def __len__(self):
+        return self.connection.execute('SELECT COUNT(*) FROM seen').fetchone()[0]
+
+    # @return True if problem_hash wasn't in the set before
+    def add(self, problem_hash):
+        cursor = self.connection.execute('INSERT OR IGNORE INTO seen VALUES (?)', (sqlite3.Binary(problem_hash),))
+        self.connection.commit()
+        return cursor.rowcount == 1
+
+    def close(self):
+        self.connection.close()
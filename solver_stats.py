@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+#
+# Author:   Armando Diaz Tolentino <ajdt@cs.washington.edu>
+#
+# Desc:     Structured solver statistics for a clingo run, collected either from
+#           the json output of the clingo application (--outf=2 --stats) or from a
+#           clingo.Control object after solving. Statistics can be appended to a
+#           metrics log, one json object per line.
+#
+import json
+import time
+from collections import namedtuple
+
+SolverStatistics = namedtuple('SolverStatistics', ['ground_time', 'solve_time', 'choices', 'conflicts',
+                                                    'rules', 'atoms', 'models', 'result'])
+
+# same result strings as the clingo application
+RESULT_STRINGS = {'SAT': 'SATISFIABLE', 'UNSAT': 'UNSATISFIABLE'}
+
+# @param clingo_json clingo's json output, witnesses aren't needed (see witness_reader.WitnessReader.summary())
+# @return SolverStatistics, counters are 0 if clingo wasn't called with --stats
+def statsFromClingoJSON(clingo_json):
+    times   = clingo_json.get('Time', {})
+    stats   = clingo_json.get('Stats', {})
+    solve_time = times.get('Solve', 0.0)
+    return SolverStatistics(
+            ground_time = times.get('Total', 0.0) - solve_time, # includes parsing and preprocessing
+            solve_time  = solve_time,
+            choices     = int(stats.get('Core', {}).get('Choices', 0)),
+            conflicts   = int(stats.get('Core', {}).get('Conflicts', 0)),
+            rules       = int(stats.get('LP', {}).get('Rules', {}).get('Original', 0)),
+            atoms       = int(stats.get('LP', {}).get('Atoms', 0)),
+            models      = int(clingo_json.get('Models', {}).get('Number', 0)),
+            result      = clingo_json.get('Result', 'UNKNOWN'))
+
+# @param control a clingo.Control object, after solving
+# @param ground_time seconds spent in control.ground()
+# @param solve_result the clingo.SolveResult returned by control.solve()
+# @return SolverStatistics for the last solve call
+def statsFromControl(control, ground_time, solve_result):
+    stats   = control.statistics
+    summary = stats['summary']
+    lp      = stats['problem']['lp']
+    solvers = stats['solving']['solvers']
+    result  = 'UNKNOWN' if solve_result is None else RESULT_STRINGS.get(str(solve_result), 'UNKNOWN')
+    return SolverStatistics(
+            ground_time = ground_time,
+            solve_time  = summary['times']['solve'],
+            choices     = int(solvers['choices']),
+            conflicts   = int(solvers['conflicts']),
+            rules       = int(lp['rules']),
+            atoms       = int(lp['atoms']),
+            models      = int(summary['models']['enumerated']),
+            result      = result)
+
+# append a single json line to the metrics log
+# @param extra dictionary with additional fields for the record, e.g. the request type or constants
+def appendToMetricsLog(file_name, stats, extra={}):
+    record = dict(extra)
+    record['timestamp'] = time.time()
+    record['stats'] = stats._asdict()
+    log_file = open(file_name, 'a')
+    log_file.write(json.dumps(record, sort_keys=True) + '\n')
+    log_file.close()
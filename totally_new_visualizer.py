@@ -18,7 +18,8 @@ import sys
 import argparse # for command line args
 from collections import defaultdict, namedtuple
 import explanation_extractor as explain
-from model_manager import ModelManager
+from model_manager import TimePartitionedModel
+import witness_reader
 import translate_tree_nodes as translator
 
 # operator symbols for eqn string generation
@@ -28,6 +29,12 @@ op_symbols      =   {'add' : '+' , 'div' : '/' , 'mul' : '*' , 'neg' : '-'}
 factor_predicates = ['factor' + n for n in list('1234')]
 factor_name_dict = {'factor1':'FACTORA' , 'factor2':'FACTORB', 'factor3':'FACTORX', 'factor4':'FACTORY' }
 
+# names of the predicates read from answer sets (see EquationStepParser.addParsedPredicate()
+# and ProblemParser.parseAnsSetFromPredicates()), make_show_directives.py --check uses it
+parsed_predicates = ['selectedHeurOperands', 'holds', 'selectedHeuristic', 'strategyExplanation',
+                        'almostApplicable', 'optimalHeuristicInstance', 'substitutedDegree',
+                        'solutionValue'] + factor_predicates
+
 # list of strategies
 all_strategies = ['cancel', 'combine', 'rearrange', 'move', 'expand']
 # contains associated methods for parsing a single math problem 
@@ -53,6 +60,8 @@ class EquationStepParser:
         self.strategy_data  = defaultdict(list)
         self.optimal_action = ''
         self.optimal_operands = []
+        # 'almost fire' explanations from _almostApplicable atoms, by strategy
+        self.almost_fire    = defaultdict(list)
 
     ##
     # @param[in]    new_var     new variable string to use
@@ -84,7 +93,7 @@ class EquationStepParser:
     ##
     # Add a predicate of the type 'strategyExplanation'.
     # These predicates help explain why a certain operation was chosen over others
-    # @param[in] pred_obj an instance of Predicate namedtuple in pred_parser module
+    # @param[in] pred_obj a ParsedPredicate instance from the pred_parser module
     def addStrategyPredicate(self, pred_obj):
         strategy_pred = pred_obj.args[1]
         strategy_name = strategy_pred.args[0].name
@@ -104,9 +113,27 @@ class EquationStepParser:
             # predicate indicates what we cannot do for the given time step
             self.strategy_data[strategy_name].append([strategy_desc + ' ' + strategy_name, []])
 
+    ##
+    # Add a predicate of the type 'almostApplicable' (generated by make_almost_fire_rules.py)
+    # These predicates tell us a heuristic would apply if one more condition held
+    # @param[in] pred_obj a ParsedPredicate instance from the pred_parser module
+    def addAlmostApplicablePredicate(self, pred_obj):
+        heur_name       = pred_obj.args[1].name
+        operand_list    = EquationStepParser.getAssignedValues(pred_obj.args[2])
+        missing_cond    = pred_obj.args[3]
+        missing_values  = EquationStepParser.getAssignedValues(missing_cond)
+        almost_fire = explain.makeAlmostFireSentences(heur_name, operand_list, missing_cond.name, missing_values)
+        self.almost_fire[explain.heuristic_to_strategy[heur_name]] += almost_fire
+
+    ##
+    # @return argument strings of pred_obj, None for the unassigned ones
+    @staticmethod
+    def getAssignedValues(pred_obj):
+        return [None if arg == 'unassigned' else arg for arg in pred_parser.argsToListOfStrings(pred_obj)]
+
     ##
     # Top level method called externally to add any predicate related to this time step
-    # @param[in] pred_obj an instance of Predicate namedtuple in pred_parser module
+    # @param[in] pred_obj a ParsedPredicate instance from the pred_parser module
     def addParsedPredicate(self, pred_obj):
         if pred_obj.name == 'selectedHeurOperands':
             # get time object and operands as strings, then add to relevant time step
@@ -126,6 +153,8 @@ class EquationStepParser:
             self.misc_data['factor_data'][factor_data_key] = monomial_factor
         elif pred_obj.name == 'strategyExplanation':
             self.addStrategyPredicate(pred_obj)
+        elif pred_obj.name == 'almostApplicable':
+            self.addAlmostApplicablePredicate(pred_obj)
         elif pred_obj.name == 'optimalHeuristicInstance':
             #print 'fancy fancy', pred_obj
             heur_inst = pred_parser.findInArgList(pred_obj, 'rule')
@@ -133,33 +162,20 @@ class EquationStepParser:
             self.optimal_operands = pred_parser.argsToListOfStrings(heur_inst.args[1])
 
     ##
-    # For every strategy we don't have an explanation for, see if we have any 
+    # For every strategy we don't have an explanation for, add its
     # 'almost fire' explanations
-    # @param[in] model_mgr manages all predicates true for this time step
-    def makeAlmostFireExplanations(self, model_mgr):
+    # NOTE: clingo finds the heuristics that almost fire (see almost_fire.lp)
+    def makeAlmostFireExplanations(self):
         for strat in all_strategies:
             if strat not in self.strategy_data.keys(): # strategy type has no explanation
-                self.makeAlmostFireExplanationFor(strat, model_mgr)
-
-    ##
-    # For a given strategy check all heuristics in that strategy type
-    # to see if any of them almost fire
-    # @param[in] strategy string representing strategy class
-    # @param[in] model_mgr manages all predicates true for this time step
-    def makeAlmostFireExplanationFor(self, strategy, model_mgr):
-        # for each heuristic in the strategy class see if it almost fires
-        for heur in explain.strategy_to_heuristic[strategy]:
-            pred_key    = explain.getTemplateManager().lookupHeuristicKey(heur)
-            almost_fire = explain.makeAlmostFireExplanations(pred_key, model_mgr)
-            # add almost_fires explanation
-            self.strategy_data[strategy] += almost_fire
+                self.strategy_data[strat] += self.almost_fire[strat]
 
     ## 
     # handles all post-processing after step parser
     # has received all predicates for this step
     # NOTE: must be called externally
     def postProcessStepData(self, model_mgr):
-        self.makeAlmostFireExplanations(model_mgr)
+        self.makeAlmostFireExplanations()
         self.translateStrategyData()
         self.makeExplanation(model_mgr)
 
@@ -285,6 +301,30 @@ class EquationStepParser:
             else: 
                 return '(' + oper_symbol.join(child_strings) + ')'
 
+    ##
+    # string representation of the equation that doesn't depend on the order of
+    # children of add and mul nodes, two problems that differ only in the order of
+    # commutative operands have the same canonical string
+    # @return canonical string for the equation at this step
+    def getCanonicalString(self):
+        return self.makeCanonicalString('id(1,1)') + '=' + self.makeCanonicalString('id(1,2)')
+
+    ##
+    # @param[in] root_node the node id of the subexpression's root
+    # @return canonical string (prefix notation) of the subexpression
+    def makeCanonicalString(self, root_node):
+        node_type = self.node_data[root_node]['type']
+        if node_type == 'mono':
+            return 'mono(' + self.node_data[root_node]['coeff'] + ',' + self.node_data[root_node]['degree'] + ')'
+        if node_type == 'div':
+            children = [self.node_data[root_node]['numer'], self.node_data[root_node]['denom']]
+        else:
+            children = self.node_data[root_node]['activechild']
+        child_strings = [self.makeCanonicalString(child) for child in children]
+        if node_type in ['add', 'mul']: # commutative operators
+            child_strings.sort()
+        return node_type + '(' + ','.join(child_strings) + ')'
+
     ##
     # make a monomial string
     # @param[in] deg string representing degree
@@ -323,7 +363,7 @@ GeneratedSolution = namedtuple('GeneratedSolution', ['problem_string', 'solution
 # This is the same as a single generated answer set.
 class ProblemParser(object):
     ##
-    # @param[in] answer_set_predicates a list of strings, each string is a predicate
+    # @param[in] answer_set_predicates a list of ParsedPredicate instances (see pred_parser)
     def __init__(self, answer_set_predicates):
         super(ProblemParser, self).__init__()
         self.solution_steps = defaultdict(EquationStepParser)
@@ -356,15 +396,15 @@ class ProblemParser(object):
 
     ##
     # parse the given predicates into the steps the describe
-    # @param[in] predicates_list a list of predicate strings
+    # @param[in] predicates_list a list of ParsedPredicate instances
     def parseAnsSetFromPredicates(self, predicates_list):
         """ compose as a string every solution in the predicate list given"""
-        model_mgr = ModelManager()
+        # every step is explained with the atoms of its own time step (see postProcessStepData)
+        model = TimePartitionedModel()
 
         # parse predicates for each time step
         # TODO: add applicable and selected heuristics
-        for predicate_string in predicates_list:
-            pred_obj    = pred_parser.predicateStringToParsedPredicate(predicate_string)
+        for pred_obj in predicates_list:
             time        = pred_parser.getTimeFromPredObject(pred_obj)
             if time != None:
                 self.addPredicateForTimeStep(time, pred_obj)
@@ -380,13 +420,13 @@ class ProblemParser(object):
                 self.soln_list.append(soln_value)
 
 
-            # add predicate to model manager
-            model_mgr.addPredicate(predicate_string)
+            # add predicate to model, it shares the parsed terms
+            model.addParsedPredicate(pred_obj)
 
         # handle post processing at solution level, and step level
         self.solutionLevelPostProcessing()
-        for eqn_step in self.solution_steps.values():
-            eqn_step.postProcessStepData(model_mgr)
+        for step, eqn_step in self.solution_steps.items():
+            eqn_step.postProcessStepData(model.getStepView(step))
 
     ##
     # After all predicates are parsed, see if any post-processing needs to be done
@@ -450,23 +490,35 @@ class AnswerSetManager:
         self.cmdline_args = cmdline_args
         # answer set dict: problem_string --> list_of_solutions (list of GeneratedProblem instances)
         self.answer_sets_dict = defaultdict(list)
+        self.solver_stats = None # solver_stats.SolverStatistics of the run that produced the answer sets
+        # parsed terms shared by the answer sets of this run, freed with the manager
+        self.term_table = pred_parser.TermTable()
 
     def initFromSTDIN(self):
         """load answer sets from stdin NOTE: expects JSON input via clingo --outf=2"""
-        all_answer_sets = self.__getJSONAnswerSetsFromSTDIN()
-        # parse the answer sets
-        for answer_set in all_answer_sets:
-            predicates = answer_set['Value']
-            # save generated version only
-            generated_soln = ProblemParser(predicates).toGeneratedSolution()
-            # add solution to list of solutions for its problem
-            self.answer_sets_dict[generated_soln.problem_string].append(generated_soln)
-
-    def __getJSONAnswerSetsFromSTDIN(self):
-        """ read json from stdin, remove underscores, load via json module and return answer sets """
-        clingo_output   = ''.join(sys.stdin.xreadlines())
-        decoded_output  = json.loads(clingo_output.replace('_', ''))
-        return decoded_output['Call'][0]['Witnesses'] # clingo provides lots of info, we just want answer sets
+        self.initFromClingoOutput(sys.stdin)
+
+    def initFromClingoOutput(self, file_obj):
+        """load answer sets from clingo json output, witnesses are read and parsed one at a time
+           returns the rest of clingo's output (Result, Models, Time and Stats)"""
+        reader = witness_reader.WitnessReader(file_obj)
+        for witness in reader.witnesses():
+            self.addAnswerSet(witness_reader.stripUnderscores(witness['Value']))
+        return reader.summary()
+
+    def addAnswerSet(self, predicates):
+        """parse a single answer set (list of predicate strings, underscores removed) and save it"""
+        self.addParsedAnswerSet([pred_parser.predicateStringToParsedPredicate(pred, self.term_table) for pred in predicates])
+
+    def addModelSymbols(self, symbols):
+        """save a single answer set solved in-process (list of clingo Symbols, see clingo_backend)"""
+        self.addParsedAnswerSet([pred_parser.symbolToParsedPredicate(symbol, self.term_table) for symbol in symbols])
+
+    def addParsedAnswerSet(self, parsed_predicates):
+        # save generated version only
+        generated_soln = ProblemParser(parsed_predicates).toGeneratedSolution()
+        # add solution to list of solutions for its problem
+        self.answer_sets_dict[generated_soln.problem_string].append(generated_soln)
 
     def printAnswerSets(self, json_printing=False, with_explanation=False):
         """display all answer sets in user-friendly way"""
@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+#
+# Author:   Armando Diaz Tolentino <ajdt@cs.washington.edu>
+#
+# Desc:     Streaming reader for clingo's json output (--outf=2). Witnesses are
+#           yielded one at a time, so memory use is bounded by the largest
+#           single witness instead of the whole output. Only the witnesses of
+#           the first call are read (same as decoded_output['Call'][0]['Witnesses']).
+#
+import re
+import json
+
+CHUNK_SIZE      = 64 * 1024
+WITNESSES_KEY   = '"Witnesses"'
+# next string or bracket in the input, the contents of strings are skipped by STRING_REGEX
+DELIMITER_REGEX = re.compile(r'["{}\[\]]')
+STRING_REGEX    = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*"')
+# everything up to the next bracket that isn't inside a string
+SKIP_REGEX      = re.compile(r'[^"{}\[\]]*(?:"[^"\\]*(?:\\.[^"\\]*)*"[^"{}\[\]]*)*')
+
+# @param predicates list of atoms from a witness
+# @return the atoms with underscores removed, the format expected by the answer set parsers
+def stripUnderscores(predicates):
+    return [atom.replace('_', '') for atom in predicates]
+
+class WitnessReader(object):
+    """iterates over the witnesses in clingo json output, reading the input in chunks"""
+    def __init__(self, file_obj, chunk_size=CHUNK_SIZE):
+        super(WitnessReader, self).__init__()
+        self.file_obj   = file_obj
+        self.chunk_size = chunk_size
+        self.buffer     = ''
+        self.pos        = 0     # scanning position in self.buffer
+        self.keep_from  = None  # start of a partially read witness, must stay in the buffer
+        self.at_eof     = False
+        self.prefix     = None  # output up to the start of the witness list, see summary()
+        self.found_witnesses = False
+        self.in_witnesses = False
+
+    # read another chunk, drops the part of the buffer that has been consumed
+    # @return False if there's no more input
+    def readChunk(self):
+        if self.at_eof:
+            return False
+        drop = self.pos if self.keep_from is None else self.keep_from
+        self.buffer = self.buffer[drop:]
+        self.pos -= drop
+        if self.keep_from is not None:
+            self.keep_from = 0
+        chunk = self.file_obj.read(self.chunk_size)
+        if not chunk:
+            self.at_eof = True
+            return False
+        self.buffer += chunk
+        return True
+
+    # @return the next token (a complete json string or a bracket), None at end of input
+    def nextToken(self):
+        while True:
+            match = DELIMITER_REGEX.search(self.buffer, self.pos)
+            if match is None:
+                self.pos = len(self.buffer)
+            elif match.group() != '"':
+                self.pos = match.end()
+                return match.group()
+            else:
+                string_match = STRING_REGEX.match(self.buffer, match.start())
+                if string_match is not None:
+                    self.pos = string_match.end()
+                    return string_match.group()
+                self.pos = match.start() # string continues in the next chunk
+            if not self.readChunk():
+                return None
+
+    # faster than nextToken(), used inside a witness where strings don't matter
+    # @return the next bracket that isn't part of a string, None at end of input
+    def nextBracket(self):
+        while True:
+            self.pos = SKIP_REGEX.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer) and self.buffer[self.pos] != '"':
+                self.pos += 1
+                return self.buffer[self.pos-1]
+            # end of buffer or a string that continues in the next chunk
+            if not self.readChunk():
+                return None
+
+    # advance past the opening bracket of the witness list
+    # @return False if the input has no witnesses
+    def skipToWitnesses(self):
+        self.keep_from = 0 # everything before the witnesses is kept for summary(), it's short
+        token = self.nextToken()
+        while token is not None and token != WITNESSES_KEY:
+            token = self.nextToken()
+        self.found_witnesses = token is not None and self.nextToken() == '['
+        self.in_witnesses = self.found_witnesses
+        self.prefix = self.buffer[:self.pos]
+        self.keep_from = None
+        return self.found_witnesses
+
+    # @return text of the next witness object, None after the last witness
+    def nextWitnessText(self):
+        token = self.nextBracket()
+        if token != '{': # end of the witness list (or truncated input)
+            self.in_witnesses = False
+            return None
+        self.keep_from = self.pos - 1
+        depth = 1
+        while depth > 0:
+            token = self.nextBracket()
+            if token is None:
+                raise ValueError('truncated clingo json output')
+            if token in ('{', '['):
+                depth += 1
+            elif token in ('}', ']'):
+                depth -= 1
+        text = self.buffer[self.keep_from:self.pos]
+        self.keep_from = None
+        return text
+
+    # @return iterator over the decoded witness objects (dicts with 'Value', maybe 'Costs')
+    def witnesses(self):
+        if not self.skipToWitnesses():
+            return
+        text = self.nextWitnessText()
+        while text is not None:
+            yield json.loads(text)
+            text = self.nextWitnessText()
+
+    # reads the rest of the input, remaining witnesses are skipped
+    # @return clingo's json output without the witnesses (Result, Models, Time, and Stats with --stats)
+    def summary(self):
+        if self.prefix is None:
+            self.skipToWitnesses()
+        while self.in_witnesses:
+            self.nextWitnessText()
+        text = self.prefix # without witnesses, this is the whole output
+        if self.found_witnesses: # the witness list ended just before self.pos
+            text += self.buffer[self.pos-1:] + self.file_obj.read()
+        try:
+            return json.loads(text)
+        except ValueError: # truncated output
+            return {}
+
+# @param file_obj file or stdin with clingo json output
+# @return iterator over the atom lists of each witness, underscores removed
+def iterWitnessValues(file_obj, chunk_size=CHUNK_SIZE):
+    for witness in WitnessReader(file_obj, chunk_size).witnesses():
+        yield stripUnderscores(witness['Value'])